@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand
+from rich.console import Console
+from rich.table import Table
+
+from books.views.book.list_books_aggregate import BookFilter
+from books.views.review.filtered import ReviewFilter
+from utils.index_advisor import (
+    find_droppable_indexes,
+    find_missing_indexes,
+    get_index_usage,
+    get_statements_index_names,
+    get_stats_reset,
+    get_workload_index_names,
+)
+from utils.memory_consumption import format_size
+
+
+class Command(BaseCommand):
+    help = "Recommend indexes to drop or create, from the index usage statistics"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--replay",
+            action="store_true",
+            help="replay the benchmark requests, indexes used by their plans are kept",
+        )
+        parser.add_argument(
+            "--library-id",
+            type=int,
+            nargs="+",
+            help="libraries of the replayed requests, picked by size otherwise",
+        )
+        parser.add_argument(
+            "--statements",
+            type=int,
+            default=50,
+            help="number of pg_stat_statements queries to explain, if installed",
+        )
+
+    def handle(self, *args, **options):
+        console = Console()
+        indexes = get_index_usage()
+
+        used_index_names = set()
+        if options["replay"]:
+            from utils.benchmarks import capture_workload
+
+            queries = capture_workload(library_ids=options["library_id"])
+            used_index_names |= get_workload_index_names(queries)
+        statements_index_names = get_statements_index_names(limit=options["statements"])
+        if statements_index_names is None:
+            console.print("pg_stat_statements is not installed, skipped")
+        else:
+            used_index_names |= statements_index_names
+
+        dropped = find_droppable_indexes(indexes, used_index_names)
+        missing = find_missing_indexes(indexes, [ReviewFilter, BookFilter])
+
+        stats_reset = get_stats_reset()
+        table = Table(
+            title="Index recommendations",
+            caption=f"Writes since {stats_reset or 'the database creation'}: "
+            "one index entry per inserted or non-HOT updated row",
+            show_lines=True,
+        )
+        table.add_column("Action")
+        table.add_column("Table")
+        table.add_column("Index")
+        table.add_column("Reason")
+        table.add_column("Size", style="bold cyan")
+        table.add_column("Index writes", style="bold green")
+        table.add_column("SQL")
+        for recommendation in dropped + missing:
+            sign = "-" if recommendation.action == "drop" else "+"
+            table.add_row(
+                recommendation.action,
+                recommendation.table_name,
+                recommendation.index_name,
+                recommendation.reason,
+                format_size(recommendation.size) if recommendation.size else "",
+                f"{sign}{recommendation.writes}",
+                recommendation.sql,
+            )
+        console.print(table)
+
+        console.print(
+            f"Dropping {len(dropped)} indexes saves "
+            f"{format_size(sum(recommendation.size for recommendation in dropped))} "
+            f"and {sum(recommendation.writes for recommendation in dropped)} index writes"
+        )
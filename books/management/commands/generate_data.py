@@ -1,15 +1,43 @@
 import logging
 from typing import cast
 
-from django.core.management.base import BaseCommand
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection
 
 from books.models import Person
-
-from .generate_data_scripts import generate_books, generate_persons
+from utils.dataset_snapshot import (
+    create_template,
+    dump_archive,
+    get_archive_path,
+    get_snapshot_key,
+    restore_archive,
+    restore_template,
+    template_exists,
+)
+
+from .generate_data_scripts import (
+    PROFILES,
+    generate_books,
+    generate_persons,
+    seed_random_streams,
+)
 
 
 logger = logging.getLogger(__name__)
 
+# options changing the generated data, which key the snapshots
+GENERATION_OPTIONS = (
+    "persons",
+    "libraries",
+    "books",
+    "avg_readers",
+    "max_readers",
+    "seed",
+    "profile",
+)
+
 
 class Command(BaseCommand):
     help = "Generates fake data"
@@ -47,13 +75,74 @@ class Command(BaseCommand):
             help="average count of readers",
             default=100,
         )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            help="seed of the random generators, for the same data and ids "
+            "with the same options and versions of Faker and Python, "
+            "in an empty database",
+        )
+        parser.add_argument(
+            "--profile",
+            choices=list(PROFILES),
+            default="uniform",
+            help="distributions of the data: uniform, or skewed with hot libraries, "
+            "authors, books and readers, bursts of reviews and long comments",
+        )
+        parser.add_argument(
+            "--pipelined",
+            action="store_true",
+            help="write the batches in a thread while the next ones are generated, "
+            "faster with several CPUs, or a remote database",
+        )
+        parser.add_argument(
+            "--snapshot",
+            choices=["archive", "template"],
+            help="restore the data generated with the same options if it was "
+            "snapshotted, otherwise generate and snapshot it: a compressed COPY archive "
+            "in DATASET_SNAPSHOT_DIR, or a template database on the server. "
+            "Meant for an empty database, restoring replaces the books tables, or "
+            "the whole database with template",
+        )
 
     def handle(self, *args, **options):
+        if options["snapshot"]:
+            self.handle_snapshot(options)
+        else:
+            self.generate(options)
+
+    def handle_snapshot(self, options):
+        key = get_snapshot_key({name: options[name] for name in GENERATION_OPTIONS})
+        if options["snapshot"] == "archive":
+            path = get_archive_path(key)
+            if path.exists():
+                logger.info(f"restoring {path}...")
+                restore_archive(path)
+            else:
+                self.generate(options)
+                logger.info(f"dumping {path}...")
+                dump_archive(path)
+        elif template_exists(key):
+            logger.info(f"restoring the template of {key}...")
+            restore_template(key)
+        else:
+            self.generate(options)
+            logger.info(f"creating the template of {key}...")
+            create_template(key)
+
+    def generate(self, options):
+        if options["seed"] is not None:
+            self.reset_sequences()
+            seed_random_streams(options["seed"])
+
         logger.info("starting data generation...")
 
         logger.info(f"adding {options['persons']} persons...")
         persons = cast(
-            list[Person], generate_persons(options["persons"], keep_results=True)
+            list[Person],
+            generate_persons(
+                options["persons"], keep_results=True, pipelined=options["pipelined"]
+            ),
         )
 
         tolstoy = Person.objects.first()
@@ -70,4 +159,15 @@ class Command(BaseCommand):
             options["avg_readers"],
             options["max_readers"],
             persons,
+            PROFILES[options["profile"]],
+            options["pipelined"],
         )
+
+    def reset_sequences(self):
+        """Start the ids at 1, for the same ids as any other seeded generation."""
+        models = list(apps.get_app_config("books").get_models())
+        if any(model._default_manager.exists() for model in models):
+            raise CommandError("--seed requires empty books tables, for the same ids")
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
@@ -1,8 +1,13 @@
 from .books import generate_books
 from .persons import generate_persons
+from .profiles import PROFILES, GenerationProfile
+from .utils import seed_random_streams
 
 
 __all__ = [
+    "PROFILES",
+    "GenerationProfile",
     "generate_books",
     "generate_persons",
+    "seed_random_streams",
 ]
@@ -1,28 +1,43 @@
 import logging
+import math
+from collections.abc import Callable
 from datetime import date
-from random import choice, choices, randint, sample
-
-from faker import Faker
 
 from books.models import Book, BookTag, Library, Person, Review
 
 from .bulk_creator import BulkCreator
-from .utils import DateTimeGenerator, binomial_distribution
+from .profiles import PROFILES, GenerationProfile
+from .utils import (
+    BurstyDateTimeGenerator,
+    DateTimeGenerator,
+    binomial_distribution,
+    get_random_stream,
+    zipf_chooser,
+    zipf_cum_weights,
+    zipf_distribution,
+    zipf_sample,
+)
 
 
 logger = logging.getLogger(__name__)
 
-fake = Faker()
+libraries_stream = get_random_stream("libraries")
+books_stream = get_random_stream("books")
+reviews_stream = get_random_stream("reviews")
+book_tags_stream = get_random_stream("book_tags")
 
-review_date_gen = DateTimeGenerator(date(2018, 5, 31), date(2023, 5, 31))
-book_date_gen = DateTimeGenerator(date(1923, 5, 31), date(2023, 5, 31))
+book_date_gen = DateTimeGenerator(
+    date(1923, 5, 31), date(2023, 5, 31), books_stream.random
+)
 
 
-def book_gen(libraries: list[Library], persons: list[Person]) -> Book:
+def book_gen(
+    choose_library: Callable[[], Library], choose_author: Callable[[], Person]
+) -> Book:
     return Book(
-        title=fake.sentence(nb_words=10, variable_nb_words=True),
-        author=choice(persons),
-        library=choice(libraries),
+        title=books_stream.fake.sentence(nb_words=10, variable_nb_words=True),
+        author=choose_author(),
+        library=choose_library(),
         release_date=book_date_gen.date_between(),
     )
 
@@ -33,65 +48,134 @@ def generate_books(
     avg_readers: int,
     max_readers: int,
     persons: list[Person],
+    profile: GenerationProfile = PROFILES["uniform"],
+    pipelined: bool = False,
 ) -> None:
     libraries = Library.objects.bulk_create(
-        Library(name=fake.company()) for _ in range(total_libraries)
+        Library(name=libraries_stream.fake.company()) for _ in range(total_libraries)
     )
 
-    with BulkCreator(Book, total=total_books, keep_results=True) as bulk_creator:
-        bulk_creator.add_many(book_gen(libraries, persons) for _ in range(total_books))
+    # the first libraries and persons have the most books
+    choose_library = zipf_chooser(libraries, profile.zipf_exponent, books_stream.random)
+    choose_author = zipf_chooser(persons, profile.zipf_exponent, books_stream.random)
+    with BulkCreator(
+        Book, total=total_books, keep_results=True, pipelined=pipelined
+    ) as bulk_creator:
+        bulk_creator.add_many(
+            book_gen(choose_library, choose_author) for _ in range(total_books)
+        )
 
-    generate_readings(avg_readers, max_readers, bulk_creator.results, persons)
-    generate_book_tags(bulk_creator.results)
+    generate_readings(
+        avg_readers, max_readers, bulk_creator.results, persons, profile, pipelined
+    )
+    generate_book_tags(bulk_creator.results, pipelined)
 
 
-def review_gen(book: Book, readers: list[Person]):
+def review_gen(
+    book: Book,
+    readers: list[Person],
+    date_gen: DateTimeGenerator,
+    profile: GenerationProfile,
+):
     return (
         Review(
             library_id=book.library_id,
             book=book,
             reader=reader,
-            rating=randint(0, 10),
-            written_at=review_date_gen.date_time_between(),
-            comments=fake.paragraph(nb_sentences=5),
+            rating=reviews_stream.random.randint(0, 10),
+            written_at=date_gen.date_time_between(),
+            comments=reviews_stream.fake.paragraph(
+                nb_sentences=comments_length(profile)
+            ),
         )
         for reader in readers
     )
 
 
+def comments_length(profile: GenerationProfile) -> int:
+    if not profile.comments_sigma:
+        return 5
+    # mostly short comments, and a long tail
+    return min(
+        1
+        + int(
+            reviews_stream.random.lognormvariate(math.log(4), profile.comments_sigma)
+        ),
+        200,
+    )
+
+
 def generate_readings(
-    avg_readers: int, max_readers: int, books: list[Book], persons: list[Person]
+    avg_readers: int,
+    max_readers: int,
+    books: list[Book],
+    persons: list[Person],
+    profile: GenerationProfile = PROFILES["uniform"],
+    pipelined: bool = False,
 ):
     logger.info(f"Generating around {avg_readers * len(books)} reviews")
-    binomial_weights = binomial_distribution(avg_readers, max_readers)
-    reader_counts = choices(
-        list(range(max_readers + 1)), weights=binomial_weights, k=len(books)
+    if profile.zipf_exponent:
+        # most books have a few readers, and a few books most of the readers
+        reader_weights = zipf_distribution(avg_readers, max_readers)
+    else:
+        reader_weights = binomial_distribution(avg_readers, max_readers)
+    reader_counts = reviews_stream.random.choices(
+        list(range(max_readers + 1)), weights=reader_weights, k=len(books)
     )
+
+    if profile.zipf_exponent:
+        # hot readers, not the hot authors
+        ranked_readers = reviews_stream.random.sample(persons, len(persons))
+        cum_weights = zipf_cum_weights(len(persons), profile.zipf_exponent)
+
+        def sample_readers(count: int) -> list[Person]:
+            return zipf_sample(
+                ranked_readers, cum_weights, count, reviews_stream.random
+            )
+
+    else:
+
+        def sample_readers(count: int) -> list[Person]:
+            return reviews_stream.random.sample(persons, count)
+
+    if profile.burst_ratio:
+        # created after the seeding, as the burst starts are random
+        date_gen: DateTimeGenerator = BurstyDateTimeGenerator(
+            date(2018, 5, 31),
+            date(2023, 5, 31),
+            reviews_stream.random,
+            burst_ratio=profile.burst_ratio,
+        )
+    else:
+        date_gen = DateTimeGenerator(
+            date(2018, 5, 31), date(2023, 5, 31), reviews_stream.random
+        )
     with BulkCreator(
-        Review, keep_results=False, total=sum(reader_counts)
+        Review, keep_results=False, total=sum(reader_counts), pipelined=pipelined
     ) as bulk_creator:
         bulk_creator.add_many(
             review
             for book, reader_count in zip(books, reader_counts)
             for review in review_gen(
-                book,
-                readers=sample(persons, reader_count),
+                book, sample_readers(reader_count), date_gen, profile
             )
         )
 
 
-def generate_book_tags(books: list[Book]):
+def generate_book_tags(books: list[Book], pipelined: bool = False):
     avg_tags_per_book = 3
     logger.info(f"Generating around {avg_tags_per_book * len(books)} book tags")
     binomial_weights = binomial_distribution(avg_tags_per_book, len(BookTag.TagName))
-    tag_counts = choices(
+    tag_counts = book_tags_stream.random.choices(
         list(range(len(BookTag.TagName) + 1)), weights=binomial_weights, k=len(books)
     )
     with BulkCreator(
-        BookTag, keep_results=False, total=sum(tag_counts)
+        BookTag, keep_results=False, total=sum(tag_counts), pipelined=pipelined
     ) as bulk_creator:
         bulk_creator.add_many(
             BookTag(name=tag_name, book=book, library_id=book.library_id)
             for book, tag_count in zip(books, tag_counts)
-            for tag_name in sample(BookTag.TagName.values, tag_count)
+            for tag_name in book_tags_stream.random.sample(
+                BookTag.TagName.values, tag_count
+            )
         )
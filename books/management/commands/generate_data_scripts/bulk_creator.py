@@ -1,19 +1,60 @@
+import logging
+import time
 from collections.abc import Iterable
+from dataclasses import dataclass
 from datetime import datetime
 from itertools import islice
+from queue import Queue
+from threading import Thread
 from typing import Generic, TypeVar
 
-from django.db import IntegrityError
+from django.db import connections, router
 from django.db.models import Model
+from django.db.models.constants import OnConflict
+from django.db.models.sql import InsertQuery
 from django.utils import timezone
 from tqdm import tqdm
 
 
+logger = logging.getLogger(__name__)
+
 ModelType = TypeVar("ModelType", bound=Model)
 
 
+@dataclass
+class BatchStats:
+    inserted: int = 0
+    updated: int = 0
+    # conflicting rows with ignore_conflicts, and duplicates within the batch
+    skipped: int = 0
+
+    def __add__(self, other: "BatchStats") -> "BatchStats":
+        return BatchStats(
+            self.inserted + other.inserted,
+            self.updated + other.updated,
+            self.skipped + other.skipped,
+        )
+
+
 class BulkCreator(Generic[ModelType]):
-    """Helper class to create a bunch of objects in bulk and display progress."""
+    """
+    Helper class to create a bunch of objects in bulk and display progress.
+
+    With ignore_conflicts or update_conflicts, rows conflicting on the
+    unique_fields are skipped or update the update_fields of the existing rows,
+    with INSERT ... ON CONFLICT. The other rows of the batch are inserted, and
+    the pks of the inserted (or updated) objects are set. Rows with a NULL in the
+    unique_fields never conflict, and are all inserted.
+
+    With pipelined, batches are written by a thread with its own connection,
+    while the next ones are generated. At most queue_size batches wait to be
+    written, and the errors of the thread are raised by the next add, or on exit.
+    With target_flush_seconds, the batch size is adapted to the observed
+    write time of the rows.
+    """
+
+    min_batch_size = 100
+    max_batch_size = 50_000
 
     start_time: datetime
 
@@ -25,6 +66,12 @@ class BulkCreator(Generic[ModelType]):
         keep_results: bool = True,
         unit: str | None = None,
         ignore_conflicts: bool = False,
+        update_conflicts: bool = False,
+        unique_fields: list[str] | None = None,
+        update_fields: list[str] | None = None,
+        pipelined: bool = False,
+        queue_size: int = 2,
+        target_flush_seconds: float | None = None,
     ) -> None:
         self.model = model
         self._batch: list[ModelType] = []
@@ -34,12 +81,45 @@ class BulkCreator(Generic[ModelType]):
         self.keep_results = keep_results
         self.batch_size = batch_size
         self._unit = unit or f" {self.model.__name__.lower()} "
-        self._ignore_conflicts = ignore_conflicts
+        self.batch_stats: list[BatchStats] = []
+        self._pipelined = pipelined
+        self._queue: Queue[list[ModelType] | None] = Queue(maxsize=queue_size)
+        self._writer: Thread | None = None
+        self._writer_error: BaseException | None = None
+        self._target_flush_seconds = target_flush_seconds
+        self._seconds_per_row: float | None = None
 
         assert batch_size > 0
+        assert not (ignore_conflicts and update_conflicts)
+        self._on_conflict = None
+        if ignore_conflicts or update_conflicts:
+            if not unique_fields:
+                raise ValueError("unique_fields are required to handle conflicts")
+            if update_conflicts and not update_fields:
+                raise ValueError("update_fields are required with update_conflicts")
+            self._on_conflict = (
+                OnConflict.UPDATE if update_conflicts else OnConflict.IGNORE
+            )
+        self._unique_fields = [
+            model._meta.get_field(name) for name in unique_fields or []
+        ]
+        self._update_fields = [
+            model._meta.get_field(name) for name in update_fields or []
+        ]
 
     def __enter__(self) -> "BulkCreator":
         self.start_time = timezone.now()
+        if self._pipelined:
+            using = router.db_for_write(self.model)
+            if connections[using].in_atomic_block:
+                # the rows would be written outside of the transaction
+                raise RuntimeError("a pipelined BulkCreator can't be used in atomic")
+            self._writer = Thread(
+                target=self._write_batches,
+                name=f"BulkCreator-{self.model.__name__}",
+                daemon=True,
+            )
+            self._writer.start()
         return self
 
     @property
@@ -48,9 +128,28 @@ class BulkCreator(Generic[ModelType]):
             raise RuntimeError("Results were not kept")
         return self._created
 
+    @property
+    def stats(self) -> BatchStats:
+        return sum(self.batch_stats, BatchStats())
+
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
-        if self._batch:
-            self.flush()
+        try:
+            if self._batch:
+                self.flush()
+        finally:
+            if self._writer is not None:
+                # the queued batches are written first
+                self._queue.put(None)
+                self._writer.join()
+                self._writer = None
+        if self._writer_error is not None and exc_type is None:
+            raise self._writer_error
+        if self._on_conflict is not None and exc_type is None:
+            stats = self.stats
+            logger.info(
+                f"{self.model.__name__}: {stats.inserted} inserted, "
+                f"{stats.updated} updated, {stats.skipped} skipped"
+            )
 
     def add(self, instance: ModelType) -> None:
         self._batch.append(instance)
@@ -66,26 +165,147 @@ class BulkCreator(Generic[ModelType]):
             # disable=self._total is None or self._total < self.batch_size,
         ) as progress_bar:
             while True:
-                chunk_size = self.batch_size - len(self._batch)
+                chunk_size = max(self.batch_size - len(self._batch), 1)
                 chunk = list(islice(instances, chunk_size))
                 self._batch += chunk
                 if len(chunk) < chunk_size:
                     break
                 self.flush()
                 progress_bar.update(len(chunk))
+                if self._on_conflict is not None:
+                    progress_bar.set_postfix(skipped=self.stats.skipped)
 
     def flush(self) -> None:
         if len(self._batch) > 0:
-            try:
-                created = self.model.objects.bulk_create(self._batch)
-            except IntegrityError:
-                # we cannot just pass _ignore_conflicts to the bulk_create,
-                # because otherwise the PK is not set in the model instances
-                if not self._ignore_conflicts:
-                    raise
+            batch, self._batch = self._batch, []
+            if self._writer is None:
+                self._write(batch)
+                return
+            if self._writer_error is not None:
+                raise self._writer_error
+            # blocks while queue_size batches are waiting: the generation waits
+            # for the database
+            self._queue.put(batch)
+
+    def _write_batches(self) -> None:
+        try:
+            while (batch := self._queue.get()) is not None:
+                if self._writer_error is None:
+                    try:
+                        self._write(batch)
+                    except BaseException as error:
+                        # the next batches are dropped, to unblock the producer
+                        self._writer_error = error
+        finally:
+            connections.close_all()
+
+    def _write(self, batch: list[ModelType]) -> None:
+        start = time.perf_counter()
+        if self._on_conflict is None:
+            created = self.model.objects.bulk_create(batch)
+            self.batch_stats.append(BatchStats(inserted=len(created)))
+        else:
+            # bulk_create(ignore_conflicts=True) doesn't set the pks
+            created = self._upsert(batch)
+        if self.keep_results:
+            self._created += created
+        self._total_created += len(created)
+        if self._target_flush_seconds is not None:
+            self._adapt_batch_size(time.perf_counter() - start, len(batch))
+
+    def _adapt_batch_size(self, duration: float, rows: int) -> None:
+        seconds_per_row = duration / rows
+        # smoothed, a single slow write (e.g. a checkpoint) doesn't shrink batches
+        if self._seconds_per_row is not None:
+            seconds_per_row = 0.7 * self._seconds_per_row + 0.3 * seconds_per_row
+        self._seconds_per_row = seconds_per_row
+        self.batch_size = min(
+            max(int(self._target_flush_seconds / seconds_per_row), self.min_batch_size),
+            self.max_batch_size,
+        )
+
+    def _get_unique_key(self, instance: ModelType) -> tuple:
+        return tuple(getattr(instance, field.attname) for field in self._unique_fields)
+
+    def _upsert(self, instances: list[ModelType]) -> list[ModelType]:
+        """
+        INSERT ... ON CONFLICT ... RETURNING the pk and the unique fields of the
+        inserted or updated rows, to set the pks of their instances.
+        Return these instances.
+        """
+        opts = self.model._meta
+        # within a batch, the first instance is kept, or the last one to update
+        by_key: dict[tuple, ModelType] = {}
+        # NULLs are distinct in unique constraints: these rows never conflict
+        without_key: list[ModelType] = []
+        for instance in instances:
+            key = self._get_unique_key(instance)
+            if None in key:
+                without_key.append(instance)
+            elif key not in by_key or self._on_conflict == OnConflict.UPDATE:
+                by_key[key] = instance
+        kept = [*by_key.values(), *without_key]
+        for instance in kept:
+            if instance.pk is None:
+                instance.pk = opts.pk.get_pk_value_on_save(instance)
+            instance._prepare_related_fields_for_save(operation_name="bulk_create")
+        # pks generated by the database, unless all the instances have one
+        with_pk = all(instance.pk is not None for instance in kept)
+        fields = [
+            field
+            for field in opts.concrete_fields
+            if with_pk or not (field.primary_key and field.db_returning)
+        ]
+
+        using = router.db_for_write(self.model)
+        connection = connections[using]
+        update = self._on_conflict == OnConflict.UPDATE
+        query = InsertQuery(
+            self.model,
+            on_conflict=self._on_conflict if update else None,
+            update_fields=self._update_fields,
+            unique_fields=self._unique_fields,
+        )
+        query.insert_values(fields, kept)
+        [(sql, params)] = query.get_compiler(using=using).as_sql()
+        if not update:
+            # Django has no conflict target with ignore_conflicts, which would skip
+            # the rows conflicting on any other unique constraint too
+            target = ", ".join(
+                connection.ops.quote_name(field.column) for field in self._unique_fields
+            )
+            sql = f"{sql} ON CONFLICT({target}) DO NOTHING"
+        returning = ", ".join(
+            connection.ops.quote_name(field.column)
+            for field in [opts.pk, *self._unique_fields]
+        )
+        with connection.cursor() as cursor:
+            # xmax is 0 for inserted rows, and the locking transaction for updated ones
+            cursor.execute(f"{sql} RETURNING {returning}, xmax = 0", params)
+            rows = cursor.fetchall()
+
+        stats = BatchStats(skipped=len(instances) - len(rows))
+        returned = {}
+        returned_without_key = []
+        for pk, *unique_values, inserted in rows:
+            if None in unique_values:
+                returned_without_key.append(pk)
             else:
-                if self.keep_results:
-                    self._created += created
-                self._total_created += len(created)
-            finally:
-                self._batch = []
+                returned[tuple(unique_values)] = pk
+            if inserted:
+                stats.inserted += 1
+            else:
+                stats.updated += 1
+        self.batch_stats.append(stats)
+
+        # in the order of the batch, the rows with a NULL in the key last: they are
+        # all inserted, and returned in the order of the VALUES
+        upserted = [instance for key, instance in by_key.items() if key in returned]
+        pks = [returned[key] for key in by_key if key in returned]
+        upserted += without_key
+        pks += returned_without_key
+        for instance, pk in zip(upserted, pks, strict=True):
+            instance.pk = pk
+            instance._state.adding = False
+            instance._state.db = using
+        return upserted
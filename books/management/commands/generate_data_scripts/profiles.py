@@ -0,0 +1,21 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    """How the generated rows are spread, see generate_data --profile."""
+
+    # exponent of the Zipf distributions of the books per library and per author,
+    # of the readers per book and of the reviews per reader, 0 for uniform ones
+    zipf_exponent: float = 0.0
+    # share of the reviews written in bursts of a few days
+    burst_ratio: float = 0.0
+    # sigma of the lognormal count of sentences of comments, 0 for ~5 sentences
+    comments_sigma: float = 0.0
+
+
+PROFILES = {
+    "uniform": GenerationProfile(),
+    # hot libraries, authors, books and readers, like in production
+    "skewed": GenerationProfile(zipf_exponent=1.1, burst_ratio=0.5, comments_sigma=1.0),
+}
@@ -1,34 +1,168 @@
 import math
+from collections.abc import Callable, Sequence
 from dataclasses import dataclass, field
-from datetime import date, datetime, time, timezone
-from random import randint
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import accumulate
+from random import Random
+from typing import TypeVar
+
+from faker import Faker
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class RandomStream:
+    """
+    Random generators of a model, seeded independently of the other models:
+    the data of a model doesn't change with the counts of the others.
+    """
+
+    name: str
+    random: Random = field(default_factory=Random)
+    fake: Faker = field(default_factory=Faker)
+
+    def seed(self, seed: int) -> None:
+        self.random.seed(f"{seed}:{self.name}")
+        self.fake.seed_instance(f"{seed}:{self.name}")
+
+
+_random_streams: dict[str, RandomStream] = {}
+
+
+def get_random_stream(name: str) -> RandomStream:
+    return _random_streams.setdefault(name, RandomStream(name))
+
+
+def seed_random_streams(seed: int) -> None:
+    for stream in _random_streams.values():
+        stream.seed(seed)
 
 
 @dataclass
 class DateTimeGenerator:
     start_date: date
     end_date: date
+    random: Random = field(default_factory=Random)
     start_timestamp: int = field(init=False)
     end_timestamp: int = field(init=False)
 
     def __post_init__(self):
+        # in UTC, for the same dates whatever the timezone of the machine
         self.start_timestamp = int(
-            datetime.combine(self.start_date, time.min).timestamp()
+            datetime.combine(self.start_date, time.min, timezone.utc).timestamp()
+        )
+        self.end_timestamp = int(
+            datetime.combine(self.end_date, time.max, timezone.utc).timestamp()
         )
-        self.end_timestamp = int(datetime.combine(self.end_date, time.max).timestamp())
 
     def date_time_between(self):
         """
         like faker's date_time_between, but much faster
         """
         return datetime.fromtimestamp(
-            randint(self.start_timestamp, self.end_timestamp), tz=timezone.utc
+            self.random.randint(self.start_timestamp, self.end_timestamp),
+            tz=timezone.utc,
         )
 
     def date_between(self):
         return self.date_time_between().date()
 
 
+@dataclass
+class BurstyDateTimeGenerator(DateTimeGenerator):
+    """
+    A share of the dates is drawn in bursts: a few days after one of the
+    burst starts, picked at random in the range on creation.
+    """
+
+    burst_ratio: float = 0.5
+    burst_count: int = 20
+    burst_duration: timedelta = timedelta(days=3)
+    burst_starts: list[int] = field(init=False)
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.burst_starts = [
+            self.random.randint(self.start_timestamp, self.end_timestamp)
+            for _ in range(self.burst_count)
+        ]
+
+    def date_time_between(self):
+        if self.random.random() >= self.burst_ratio:
+            return super().date_time_between()
+        timestamp = self.random.choice(self.burst_starts) + int(
+            self.random.expovariate(1 / self.burst_duration.total_seconds())
+        )
+        return datetime.fromtimestamp(
+            min(timestamp, self.end_timestamp), tz=timezone.utc
+        )
+
+
 def binomial_distribution(expected_value: int, n: int) -> list[float]:
     p = expected_value / n
     return [math.comb(n, k) * p**k * (1 - p) ** (n - k) for k in range(n + 1)]
+
+
+def zipf_cum_weights(n: int, exponent: float) -> list[float]:
+    """Cumulative weights of the ranks 1 to n, proportional to rank^-exponent."""
+    return list(accumulate(rank**-exponent for rank in range(1, n + 1)))
+
+
+def zipf_chooser(
+    population: Sequence[T], exponent: float, random: Random
+) -> Callable[[], T]:
+    """
+    Return a function picking an item of the population, the first ones more
+    often with a Zipf distribution, or uniformly with a zero exponent.
+    """
+    if not exponent:
+        return lambda: random.choice(population)
+    cum_weights = zipf_cum_weights(len(population), exponent)
+    return lambda: random.choices(population, cum_weights=cum_weights)[0]
+
+
+def zipf_sample(
+    population: Sequence[T], cum_weights: list[float], k: int, random: Random
+) -> list[T]:
+    """Sample k distinct items, weighted by the cumulative weights."""
+    if k > len(population) // 2:
+        # too many draws would be rejected
+        return random.sample(population, k)
+    indexes: dict[int, None] = {}
+    while len(indexes) < k:
+        indexes.update(
+            dict.fromkeys(
+                random.choices(
+                    range(len(population)), cum_weights=cum_weights, k=k - len(indexes)
+                )
+            )
+        )
+    return [population[index] for index in list(indexes)[:k]]
+
+
+def zipf_distribution(expected_value: int, n: int) -> list[float]:
+    """
+    Weights of the values 0 to n, proportional to (value + 1)^-a, with the
+    exponent a for which the expected value is `expected_value`.
+    """
+
+    def get_weights(exponent: float) -> list[float]:
+        return [(value + 1) ** -exponent for value in range(n + 1)]
+
+    def get_mean(exponent: float) -> float:
+        weights = get_weights(exponent)
+        return sum(value * weight for value, weight in enumerate(weights)) / sum(
+            weights
+        )
+
+    # the mean decreases with the exponent
+    low, high = -10.0, 10.0
+    for _ in range(60):
+        middle = (low + high) / 2
+        if get_mean(middle) > expected_value:
+            low = middle
+        else:
+            high = middle
+    return get_weights((low + high) / 2)
@@ -0,0 +1,103 @@
+import subprocess
+from statistics import median
+
+from django.core.management.base import BaseCommand, CommandError
+from rich.console import Console
+from rich.table import Table
+
+from utils.benchmark_results import format_delta
+from utils.import_time import get_package_times, measure_startup, profile_imports
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile the startup of a management command with python -X importtime, "
+        "e.g. profile_startup --lean -- run_benchmark --help"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "argv",
+            nargs="*",
+            default=["check"],
+            help="command to profile, with its arguments after --",
+        )
+        parser.add_argument(
+            "--lean",
+            action="store_true",
+            help="compare with the lean settings mode (LEAN_SETTINGS)",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=15,
+            help="number of packages to show, by cumulative import time",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="number of runs, the median times are shown",
+        )
+
+    def handle(self, *args, **options):
+        console = Console()
+        argv = options["argv"]
+        modes = {"default": False, **({"lean": True} if options["lean"] else {})}
+
+        startup_table = Table(title=f"Startup of manage.py {' '.join(argv)}")
+        startup_table.add_column("Settings")
+        startup_table.add_column("Wall time", style="bold cyan")
+        startup_table.add_column("CPU time", style="bold cyan")
+        startup_table.add_column("Import time", style="bold green")
+        startup_table.add_column("Modules")
+        runs = {name: [] for name in modes}
+        for repetition in range(options["repeat"]):
+            # interleaved, so that a change of the machine load affects every mode,
+            # in alternating orders, as the second run of a pair is often slower
+            order = list(modes.items())[:: -1 if repetition % 2 else 1]
+            for name, lean in order:
+                try:
+                    runs[name].append(measure_startup(argv, lean=lean))
+                except subprocess.CalledProcessError as error:
+                    raise CommandError(
+                        f"manage.py {' '.join(argv)} failed:\n{error.stderr}"
+                    ) from error
+
+        package_times = {}
+        baseline = None
+        for name, lean in modes.items():
+            # the min is as noisy as the load of the machine, on a single CPU
+            durations = tuple(map(median, zip(*runs[name])))
+            imports = profile_imports(argv, lean=lean)
+            package_times[name] = get_package_times(imports)
+            baseline = baseline or durations
+            startup_table.add_row(
+                name,
+                *(
+                    f"{duration * 1000:.0f} ms"
+                    + (
+                        f" ({format_delta((duration - reference) / reference)})"
+                        if durations is not baseline
+                        else ""
+                    )
+                    for duration, reference in zip(durations, baseline)
+                ),
+                f"{sum(package_times[name].values()) / 1000:.0f} ms",
+                str(len(imports)),
+            )
+        console.print(startup_table)
+
+        packages_table = Table(title="Cumulative import time by top-level package")
+        packages_table.add_column("Package")
+        for name in modes:
+            packages_table.add_column(name, style="bold cyan")
+        for package, _ in package_times["default"].most_common(options["top"]):
+            packages_table.add_row(
+                package,
+                *(
+                    f"{times[package] / 1000:.1f} ms" if package in times else "-"
+                    for times in package_times.values()
+                ),
+            )
+        console.print(packages_table)
@@ -1,13 +1,26 @@
 import statistics
 import timeit
+from contextlib import ExitStack
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.urls import reverse
-from rest_framework.test import APIClient
 from rich.console import Console
 from rich.table import Table
 
 from books.models import Library
+from utils.benchmarks import (
+    CACHE_MODES,
+    LIBRARY_SIZES,
+    REVIEW_URL_NAMES,
+    benchmark_connection_configurations,
+    benchmark_index_configurations,
+    benchmark_matrix,
+    get_client,
+    output_results,
+    pick_libraries_by_size,
+)
+from utils.index_experiment import load_index_configurations
+from utils.load_test import gunicorn_server, run_load_test
 
 
 class Command(BaseCommand):
@@ -17,26 +30,186 @@ class Command(BaseCommand):
         parser.add_argument(
             "--url",
             type=str,
-            help="url name, as defined in urls.py",
+            help="url name, as defined in urls.py, every route with --matrix",
         )
 
         parser.add_argument(
             "--library-id",
             type=int,
-            help="library id to use",
+            help="library id to use, libraries are picked by size otherwise",
+        )
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            choices=LIBRARY_SIZES,
+            default=list(LIBRARY_SIZES),
+            help="sizes of the libraries to benchmark, by count of books",
         )
         parser.add_argument(
             "--number", type=int, help="number of executions for each test", default=3
         )
+        parser.add_argument(
+            "--matrix",
+            action="store_true",
+            help="benchmark every route with the query params of utils/benchmarks.py",
+        )
+        parser.add_argument(
+            "--cache",
+            nargs="+",
+            choices=CACHE_MODES,
+            default=["warm"],
+            help="cache modes of the matrix: warm (prewarm and warmup runs) or cold",
+        )
+        parser.add_argument(
+            "--warmup-runs",
+            type=int,
+            help="number of runs before measuring, in warm cache mode",
+            default=1,
+        )
+        parser.add_argument(
+            "--index-experiment",
+            type=str,
+            help="JSON file of index configurations to benchmark, see utils/index_experiment.py",
+        )
+        parser.add_argument(
+            "--connections",
+            action="store_true",
+            help="benchmark persistent connections, a connection per request, "
+            "a pool and prepared statements, on the review endpoints by default",
+        )
+        parser.add_argument(
+            "--json",
+            type=str,
+            help="write the results as JSON to this file, - for stdout",
+        )
+        parser.add_argument(
+            "--save",
+            action="store_true",
+            help="store the results, keyed by git commit and dataset shape",
+        )
+        parser.add_argument(
+            "--compare",
+            type=str,
+            help="compare with stored results, from a git commit or a JSON file",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            help="load test with this number of concurrent clients, over HTTP",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            help="duration of the load test, in seconds",
+            default=10,
+        )
+        parser.add_argument(
+            "--warmup",
+            type=float,
+            help="seconds of load before recording results",
+            default=1,
+        )
+        parser.add_argument(
+            "--base-url",
+            type=str,
+            help="server to load test, a local gunicorn is started otherwise",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="number of workers of the local gunicorn, defaults to concurrency",
+        )
 
     def handle(self, *args, **options):
-        client = APIClient()
         url_name = options["url"]
+        # keep stdout clean for the JSON output
+        console = Console(stderr=options["json"] == "-")
+
+        if options["concurrency"] and (
+            options["matrix"] or options["index_experiment"] or options["connections"]
+        ):
+            raise CommandError(
+                "--concurrency can't be combined with --matrix, --index-experiment "
+                "or --connections"
+            )
 
-        # TODO make sure they exists
-        alexandria, personal = Library.objects.filter(
-            name__in=["Alexandria", "Personal"]
-        ).order_by("id")
+        if options["matrix"]:
+            benchmark_results = benchmark_matrix(
+                url_names=[url_name] if url_name else None,
+                sizes=options["sizes"],
+                library_ids=[options["library_id"]] if options["library_id"] else None,
+                repeat=options["number"],
+                warmup=options["warmup_runs"],
+                cache_modes=options["cache"],
+                console=console,
+            )
+            return output_results(
+                console,
+                benchmark_results,
+                save=options["save"],
+                compare_to=options["compare"],
+                json_path=options["json"],
+            )
+
+        if options["index_experiment"]:
+            results_by_configuration = benchmark_index_configurations(
+                load_index_configurations(options["index_experiment"]),
+                url_names=[url_name] if url_name else None,
+                sizes=options["sizes"],
+                library_ids=[options["library_id"]] if options["library_id"] else None,
+                repeat=options["number"],
+                warmup=options["warmup_runs"],
+                console=console,
+            )
+            benchmark_results = [
+                result
+                for results in results_by_configuration.values()
+                for result in results
+            ]
+            return output_results(
+                console,
+                benchmark_results,
+                save=options["save"],
+                compare_to=options["compare"],
+                json_path=options["json"],
+            )
+
+        if options["connections"]:
+            results_by_configuration = benchmark_connection_configurations(
+                url_names=[url_name] if url_name else REVIEW_URL_NAMES,
+                sizes=options["sizes"],
+                library_ids=[options["library_id"]] if options["library_id"] else None,
+                repeat=options["number"],
+                warmup=options["warmup_runs"],
+                console=console,
+            )
+            benchmark_results = [
+                result
+                for results in results_by_configuration.values()
+                for result in results
+            ]
+            return output_results(
+                console,
+                benchmark_results,
+                save=options["save"],
+                compare_to=options["compare"],
+                json_path=options["json"],
+            )
+
+        if not url_name:
+            raise CommandError(
+                "--url is required, unless --matrix, --index-experiment "
+                "or --connections is used"
+            )
+
+        if options["library_id"]:
+            libraries = [Library.objects.get(id=options["library_id"])]
+        else:
+            library_ids = pick_libraries_by_size(options["sizes"]).values()
+            libraries = list(Library.objects.filter(id__in=library_ids).order_by("id"))
+
+        if options["concurrency"]:
+            return self.handle_load_test(url_name, libraries, console, options)
 
         table = Table(title="Endpoint benchmark")
         table.add_column("endpoint URL")
@@ -46,10 +219,13 @@ class Command(BaseCommand):
         table.add_column("Runs")
 
         repeat = options["number"]
+        benchmark_results = []
 
-        for library in [alexandria, personal]:
+        for library in libraries:
             url = reverse(url_name, args=[library.id])
-            results = timeit.repeat(lambda: client.get(url), number=1, repeat=repeat)
+            results = timeit.repeat(
+                lambda: get_client().get(url), number=1, repeat=repeat
+            )
 
             table.add_row(
                 url,
@@ -58,6 +234,72 @@ class Command(BaseCommand):
                 f"{max(results):.3f} s",
                 str(repeat),
             )
+            benchmark_results.append(
+                {
+                    "url_name": url_name,
+                    "library_id": library.id,
+                    "query_params": {},
+                    "durations": results,
+                }
+            )
 
-        console = Console()
         console.print(table)
+        output_results(
+            console,
+            benchmark_results,
+            save=options["save"],
+            compare_to=options["compare"],
+            json_path=options["json"],
+        )
+
+    def handle_load_test(self, url_name, libraries, console, options):
+        urls = {reverse(url_name, args=[library.id]): library for library in libraries}
+        concurrency, duration = options["concurrency"], options["duration"]
+
+        with ExitStack() as stack:
+            base_url = options["base_url"] or stack.enter_context(
+                gunicorn_server(workers=options["workers"] or concurrency)
+            )
+            load_results = run_load_test(
+                base_url, list(urls), concurrency, duration, warmup=options["warmup"]
+            )
+
+        table = Table(title=f"Load test: {concurrency} clients for {duration} s")
+        table.add_column("endpoint URL")
+        table.add_column("Library")
+        table.add_column("Throughput", style="bold cyan")
+        table.add_column("p50")
+        table.add_column("p95")
+        table.add_column("p99", style="bold green")
+        table.add_column("Errors")
+
+        benchmark_results = []
+        for url, result in load_results.items():
+            table.add_row(
+                url,
+                str(urls[url]),
+                f"{len(result.latencies) / duration:.1f} req/s",
+                f"{result.percentile(50):.3f} s",
+                f"{result.percentile(95):.3f} s",
+                f"{result.percentile(99):.3f} s",
+                f"{result.errors} ({result.error_rate:.1%})",
+            )
+            benchmark_results.append(
+                {
+                    "url_name": url_name,
+                    "library_id": urls[url].id,
+                    "query_params": {},
+                    "concurrency": concurrency,
+                    "durations": result.latencies,
+                    "errors": result.errors,
+                }
+            )
+
+        console.print(table)
+        output_results(
+            console,
+            benchmark_results,
+            save=options["save"],
+            compare_to=options["compare"],
+            json_path=options["json"],
+        )
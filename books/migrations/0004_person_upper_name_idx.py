@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:49
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0003_alter_library_options_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="person",
+            index=models.Index(
+                django.db.models.functions.text.Upper("name"),
+                name="person_upper_name_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+# GIN trigram indexes for the icontains lookups, which compare UPPER(column) LIKE,
+# only created when pg_trgm is available: they are not declared on the models
+TRIGRAM_INDEXES = {
+    "person_upper_name_trgm_idx": ("books_person", "name"),
+    "book_upper_title_trgm_idx": ("books_book", "title"),
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS(SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm')"
+        )
+        (available,) = cursor.fetchone()
+    if not available:
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for index_name, (table_name, column) in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{table_name}" '
+            f'USING gin (UPPER("{column}") gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    for index_name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("books", "0004_person_upper_name_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,155 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:42
+
+from django.db import migrations, models
+
+
+# Book.tag_mask is maintained by statement-level triggers on books_booktag, so the
+# QuerySet and bulk paths (bulk_create, upserts, QuerySet.delete, cascades) keep it
+# up to date too, with a query per statement instead of one per row
+CREATE_FUNCTIONS_SQL = """
+-- the bit of a tag name, in the BookTag.TagName order, see get_tag_mask
+CREATE FUNCTION books_tag_bit(name varchar) RETURNS smallint
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE name
+        WHEN 'comics' THEN 1
+        WHEN 'braille' THEN 2
+        WHEN 'audio' THEN 4
+        WHEN 'movie' THEN 8
+        WHEN 'french' THEN 16
+        WHEN 'german' THEN 32
+        ELSE 0
+    END::smallint
+$$;
+
+-- added tags only set bits: no need to read the other tags of the books
+CREATE FUNCTION books_booktag_add_tag_mask() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE books_book SET tag_mask = books_book.tag_mask | added.mask
+    FROM (
+        SELECT book_id, bit_or(books_tag_bit(name)) AS mask
+        FROM new_tags GROUP BY book_id
+    ) AS added
+    WHERE books_book.id = added.book_id
+        AND books_book.tag_mask & added.mask <> added.mask;
+    RETURN NULL;
+END
+$$;
+
+-- the masks of the books of removed or renamed tags are computed again
+CREATE FUNCTION books_book_reset_tag_mask(book_ids bigint[]) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- locked first, so that the masks are computed from the tags committed by
+    -- concurrent transactions changing the same books
+    PERFORM 1 FROM books_book WHERE id = ANY(book_ids) ORDER BY id FOR NO KEY UPDATE;
+    UPDATE books_book SET tag_mask = computed.mask
+    FROM (
+        SELECT book.id, coalesce(bit_or(books_tag_bit(tag.name)), 0) AS mask
+        FROM unnest(book_ids) AS book(id)
+        LEFT JOIN books_booktag AS tag ON tag.book_id = book.id
+        GROUP BY book.id
+    ) AS computed
+    WHERE books_book.id = computed.id AND books_book.tag_mask <> computed.mask;
+END
+$$;
+
+CREATE FUNCTION books_booktag_remove_tag_mask() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM books_book_reset_tag_mask(ARRAY(SELECT DISTINCT book_id FROM old_tags));
+    RETURN NULL;
+END
+$$;
+
+CREATE FUNCTION books_booktag_update_tag_mask() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM books_book_reset_tag_mask(
+        ARRAY(SELECT book_id FROM old_tags UNION SELECT book_id FROM new_tags)
+    );
+    RETURN NULL;
+END
+$$;
+
+-- Book.save() writes every field: keep the mask unless set by the triggers above
+CREATE FUNCTION books_book_keep_tag_mask() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.tag_mask := OLD.tag_mask;
+    RETURN NEW;
+END
+$$;
+"""
+
+BACKFILL_SQL = """
+UPDATE books_book SET tag_mask = computed.mask
+FROM (
+    SELECT book_id, bit_or(books_tag_bit(name)) AS mask
+    FROM books_booktag GROUP BY book_id
+) AS computed
+WHERE books_book.id = computed.book_id;
+"""
+
+# a transition table can only be declared on a trigger of a single event
+CREATE_TRIGGERS_SQL = """
+CREATE TRIGGER books_booktag_insert_tag_mask
+AFTER INSERT ON books_booktag REFERENCING NEW TABLE AS new_tags
+FOR EACH STATEMENT EXECUTE FUNCTION books_booktag_add_tag_mask();
+
+CREATE TRIGGER books_booktag_delete_tag_mask
+AFTER DELETE ON books_booktag REFERENCING OLD TABLE AS old_tags
+FOR EACH STATEMENT EXECUTE FUNCTION books_booktag_remove_tag_mask();
+
+CREATE TRIGGER books_booktag_update_tag_mask
+AFTER UPDATE ON books_booktag REFERENCING OLD TABLE AS old_tags NEW TABLE AS new_tags
+FOR EACH STATEMENT EXECUTE FUNCTION books_booktag_update_tag_mask();
+
+-- pg_trigger_depth() is 0 for the statements of the app, 1 for the triggers above
+CREATE TRIGGER books_book_keep_tag_mask
+BEFORE UPDATE OF tag_mask ON books_book FOR EACH ROW
+WHEN (pg_trigger_depth() = 0 AND NEW.tag_mask IS DISTINCT FROM OLD.tag_mask)
+EXECUTE FUNCTION books_book_keep_tag_mask();
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER books_book_keep_tag_mask ON books_book;
+DROP TRIGGER books_booktag_update_tag_mask ON books_booktag;
+DROP TRIGGER books_booktag_delete_tag_mask ON books_booktag;
+DROP TRIGGER books_booktag_insert_tag_mask ON books_booktag;
+"""
+
+DROP_FUNCTIONS_SQL = """
+DROP FUNCTION books_book_keep_tag_mask();
+DROP FUNCTION books_booktag_update_tag_mask();
+DROP FUNCTION books_booktag_remove_tag_mask();
+DROP FUNCTION books_book_reset_tag_mask(bigint[]);
+DROP FUNCTION books_booktag_add_tag_mask();
+DROP FUNCTION books_tag_bit(varchar);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0005_optional_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="tag_mask",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(CREATE_FUNCTIONS_SQL, DROP_FUNCTIONS_SQL),
+        # before the triggers: books_book_keep_tag_mask would ignore it
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.RunSQL(CREATE_TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+        # after the backfill, built once
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["library", "tag_mask"], name="book_library_tag_mask_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+# the tag names of a Book.tag_mask, in the BookTag.TagName order, see get_tag_names;
+# a high cost, so that the planner only evaluates it for the rows of a LIMIT
+CREATE_FUNCTION_SQL = """
+CREATE FUNCTION books_tag_names(tag_mask smallint) RETURNS varchar[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE COST 1000 AS $$
+    SELECT ARRAY(
+        SELECT tag.name
+        FROM unnest(
+            ARRAY['comics', 'braille', 'audio', 'movie', 'french', 'german']::varchar[]
+        ) WITH ORDINALITY AS tag(name, position)
+        WHERE tag_mask & books_tag_bit(tag.name) <> 0
+        ORDER BY tag.position
+    )
+$$;
+"""
+
+DROP_FUNCTION_SQL = "DROP FUNCTION books_tag_names(smallint);"
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("books", "0007_response_cache_versions"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_FUNCTION_SQL, DROP_FUNCTION_SQL),
+    ]
@@ -13,6 +13,9 @@ class Book(models.Model):
     readers = models.ManyToManyField(Person, related_name="readings", through="Review")
 
     library = models.ForeignKey(Library, on_delete=models.CASCADE, related_name="books")
+    # a bit per BookTag.TagName of the tags of the book, see get_tag_mask,
+    # maintained by the triggers of the 0006 migration: read-only for the app
+    tag_mask = models.PositiveSmallIntegerField(default=0, editable=False)
 
     # typing
     library_id: int
@@ -26,7 +29,11 @@ class Book(models.Model):
         indexes = [
             models.Index(
                 fields=("library", "release_date"), name="book_library_release_date_idx"
-            )
+            ),
+            # tag filters, with an IN list of the matching masks
+            models.Index(
+                fields=("library", "tag_mask"), name="book_library_tag_mask_idx"
+            ),
         ]
 
     def __str__(self) -> str:
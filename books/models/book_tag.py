@@ -1,5 +1,9 @@
+from collections.abc import Iterable
+
 from django.db import models
 
+from utils.response_cache import invalidate_library_on_commit
+
 from .book import Book
 from .library import Library
 
@@ -10,6 +14,9 @@ class BookTag(models.Model):
         If the book is also available in a specific format, the related tag is created
         """
 
+        # the bits of Book.tag_mask follow this order: append new names, and update
+        # the books_tag_bit and books_tag_names SQL functions in a migration
+
         COMICS = "comics"
         BRAILLE = "braille"
         AUDIO = "audio"
@@ -31,5 +38,41 @@ class BookTag(models.Model):
             )
         ]
 
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate_library_on_commit(self.library_id)
+        return result
+
     def __str__(self):
         return f"BookTag ({self.id}) {self.name}"
+
+
+def get_tag_mask(tag_names: Iterable[str]) -> int:
+    """Return the Book.tag_mask of the given tag names."""
+    bits = {name: 1 << i for i, name in enumerate(BookTag.TagName.values)}
+    mask = 0
+    for name in tag_names:
+        mask |= bits[name]
+    return mask
+
+
+def get_tag_names(tag_mask: int) -> list[str]:
+    """Return the tag names of a Book.tag_mask, in the TagName order."""
+    return [
+        name for i, name in enumerate(BookTag.TagName.values) if tag_mask & (1 << i)
+    ]
+
+
+def get_matching_tag_masks(
+    tag_names: Iterable[str], match_all: bool = True
+) -> list[int]:
+    """
+    Return every Book.tag_mask with all the given tag names, or with any of them:
+    an IN list that an index on tag_mask can serve, unlike a bitwise AND.
+    """
+    mask = get_tag_mask(tag_names)
+    return [
+        value
+        for value in range(1 << len(BookTag.TagName))
+        if (value & mask == mask if match_all else value & mask)
+    ]
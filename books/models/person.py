@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Upper
 
 
 class Person(models.Model):
@@ -6,5 +7,9 @@ class Person(models.Model):
     name = models.TextField()
     bio = models.TextField()
 
+    class Meta:
+        # for the case insensitive lookups (iexact) which compare UPPER(name)
+        indexes = [models.Index(Upper("name"), name="person_upper_name_idx")]
+
     def __str__(self):
         return f"Library ({self.id}) {self.name}"
@@ -1,5 +1,7 @@
 from django.db import models
 
+from utils.response_cache import invalidate_library_on_commit
+
 from .book import Book
 from .library import Library
 from .person import Person
@@ -25,5 +27,10 @@ class Review(models.Model):
         # TODO change to library - rating index
         indexes = [models.Index(fields=["rating"], name="review_rating_idx")]
 
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate_library_on_commit(self.library_id)
+        return result
+
     def __str__(self):
         return f"Review ({self.id})"
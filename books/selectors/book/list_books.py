@@ -1,9 +1,22 @@
-from django.contrib.postgres.aggregates import ArrayAgg
-from django.contrib.postgres.expressions import ArraySubquery
-from django.db.models import Count, OuterRef, Q, QuerySet
+from collections.abc import Iterable
+
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import CharField, Count, Func, OuterRef, Q, QuerySet
 from django.db.models.functions import Coalesce
 
-from books.models import Book, BookTag, Review
+from books.models import Book, Review
+from books.models.book_tag import get_matching_tag_masks
+
+
+class TagNames(Func):
+    """The tag names of a Book.tag_mask, like get_tag_names, see the 0008 migration"""
+
+    function = "books_tag_names"
+    output_field = ArrayField(CharField())
+
+    def get_group_by_cols(self):
+        # grouped by tag_mask only, so that the function is evaluated after LIMIT
+        return self.get_source_expressions()[0].get_group_by_cols()
 
 
 def list_books_aggregate(book_qs: QuerySet[Book], review_filters: dict | None = None):
@@ -16,9 +29,10 @@ def list_books_aggregate(book_qs: QuerySet[Book], review_filters: dict | None =
         if review_filters is None
         else {f"reviews__{key}": value for key, value in review_filters.items()}
     )
+    # a single join: with the tags joined too, the reviews were counted once per tag
     return book_qs.annotate(
         review_count=Count("reviews", filter=Q(**review_filters)),
-        tag_names=ArrayAgg("tags__name"),
+        tag_names=TagNames("tag_mask"),
     )
 
 
@@ -31,7 +45,17 @@ def list_books_subquery(book_qs: QuerySet[Book], review_filters: dict | None = N
             .values("count"),
             0,
         ),
-        tag_names=ArraySubquery(
-            BookTag.objects.filter(book_id=OuterRef("id")).values("name")
-        ),
+        tag_names=TagNames("tag_mask"),
+    )
+
+
+def filter_books_by_tags(
+    book_qs: QuerySet[Book], tag_names: Iterable[str], match_all: bool = True
+) -> QuerySet[Book]:
+    """
+    return the books with all the given tags, or with any of them,
+    without joining the tags: served by book_library_tag_mask_idx
+    """
+    return book_qs.filter(
+        tag_mask__in=get_matching_tag_masks(tag_names, match_all=match_all)
     )
@@ -1,11 +1,24 @@
 from books.models import Book
+from books.selectors.iteration import iterate_rows
 
 
 def list_readers_per_book(library_id) -> dict[str, list[str]]:
     """
     Return a dict {book_title: [reader.name]} for a given library
     """
-    books = Book.objects.filter(library_id=library_id)
-    return {
-        book.title: [reader.name for reader in book.readers.all()] for book in books
-    }
+    # a single query, streamed: a row per reading, or per book without readers
+    rows = (
+        Book.objects.filter(library_id=library_id)
+        .order_by("id")
+        .values_list("id", "title", "readers__name")
+    )
+    readers_per_book: dict[str, list[str]] = {}
+    book_id = None
+    for row_book_id, title, reader_name in iterate_rows(rows):
+        if row_book_id != book_id:
+            # the last book of a title wins, like with a dict comprehension
+            book_id = row_book_id
+            readers_per_book[title] = readers = []
+        if reader_name is not None:
+            readers.append(reader_name)
+    return readers_per_book
@@ -0,0 +1,28 @@
+from collections.abc import Iterator
+from itertools import islice
+
+from django.db.models import QuerySet
+
+
+# rows fetched per round trip, and objects per prefetch_related query
+DEFAULT_CHUNK_SIZE = 2_000
+
+
+def iterate_rows(queryset: QuerySet, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator:
+    """
+    Yield the rows of the queryset, model instances or values_list / values
+    projections, fetched chunk_size at a time with a server-side cursor:
+    only a chunk of rows is in memory at once.
+    The prefetch_related lookups of the queryset run once per chunk.
+    """
+    # the results are not cached in the queryset, unlike with list(queryset)
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def iterate_chunks(
+    queryset: QuerySet, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[list]:
+    """Like iterate_rows, yielding lists of up to chunk_size rows."""
+    rows = iterate_rows(queryset, chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
@@ -0,0 +1,76 @@
+from django.db.models import Avg, Count, Exists, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+
+from books.models import Book, Person, Review
+
+
+def list_author_stats_aggregate(library_id: int) -> QuerySet[Person]:
+    """
+    return the authors of the library, annotated with their count of books,
+    count of reviews and average rating, with a GROUP BY
+    """
+    return Person.objects.filter(writings__library_id=library_id).annotate(
+        book_count=Count("writings", distinct=True),
+        review_count=Count("writings__reviews"),
+        average_rating=Avg("writings__reviews__rating"),
+    )
+
+
+def list_author_stats_subquery(library_id: int) -> QuerySet[Person]:
+    """
+    same as list_author_stats_aggregate, with correlated subqueries
+    """
+    books = Book.objects.filter(library_id=library_id, author_id=OuterRef("id"))
+    reviews = Review.objects.filter(
+        library_id=library_id, book__author_id=OuterRef("id")
+    ).values("book__author_id")
+    return Person.objects.filter(Exists(books)).annotate(
+        book_count=Subquery(
+            books.values("author_id").annotate(count=Count("id")).values("count")
+        ),
+        review_count=Coalesce(
+            Subquery(reviews.annotate(count=Count("id")).values("count")), 0
+        ),
+        average_rating=Subquery(
+            reviews.annotate(average=Avg("rating")).values("average")
+        ),
+    )
+
+
+AUTHOR_STATS_ENGINES = {
+    "aggregate": list_author_stats_aggregate,
+    "subquery": list_author_stats_subquery,
+}
+
+
+# The GROUP BY walks the books of the library in author order from the first
+# author, the keyset filter only applies to the persons. Past this count of books
+# before the page, the subqueries, which only run for the authors of the page,
+# are faster (~5 ms each on 30k books per library).
+AGGREGATE_MAX_SKIPPED_BOOKS = 5_000
+
+
+def list_author_stats(
+    library_id: int,
+    after_id: int | None = None,
+    before_id: int | None = None,
+    engine: str | None = None,
+) -> QuerySet[Person]:
+    """
+    return the author stats, with the given engine ("aggregate" or "subquery"),
+    or the fastest one for a page starting after `after_id` (or before `before_id`
+    for a page in reverse order)
+    """
+    if engine is None:
+        books = Book.objects.filter(library_id=library_id)
+        if after_id is not None:
+            books = books.filter(author_id__lte=after_id)
+        elif before_id is not None:
+            books = books.filter(author_id__gte=before_id)
+        else:
+            books = books.none()
+        skipped_books = books[:AGGREGATE_MAX_SKIPPED_BOOKS].count()
+        engine = (
+            "aggregate" if skipped_books < AGGREGATE_MAX_SKIPPED_BOOKS else "subquery"
+        )
+    return AUTHOR_STATS_ENGINES[engine](library_id)
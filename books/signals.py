@@ -0,0 +1,31 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from books.models import Book, BookTag, Review
+from utils.response_cache import invalidate_library_on_commit
+
+
+# no delete receivers for reviews and tags: they would prevent the fast deletes
+# (a single DELETE query) of QuerySet.delete() and of cascades, see their delete()
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=BookTag)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Book)
+def invalidate_library_responses(sender, instance, **kwargs):
+    invalidate_library_on_commit(instance.library_id)
+
+
+@receiver(m2m_changed, sender=Book.readers.through)
+def invalidate_readers_responses(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith("post_"):
+            invalidate_library_on_commit(instance.library_id)
+    # from a person, the libraries of the books
+    elif action == "pre_clear":
+        invalidate_library_on_commit(
+            *Book.objects.filter(readers=instance).values_list("library_id", flat=True)
+        )
+    elif action in ("post_add", "post_remove"):
+        invalidate_library_on_commit(
+            *Book.objects.filter(pk__in=pk_set).values_list("library_id", flat=True)
+        )
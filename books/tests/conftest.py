@@ -1,14 +1,23 @@
+import os
+from pathlib import Path
+
 import pytest
 from django.core.management import call_command
 
 from books.models.library import Library
 from utils.assert_queries import assert_django_queries_manager
+from utils.dataset_snapshot import restore_archive
+from utils.n_plus_one import assert_no_n_plus_one as assert_no_n_plus_one_manager
 
 
 @pytest.fixture(scope="session")
 def django_db_setup(django_db_setup, django_db_createdb, django_db_blocker):
     with django_db_blocker.unblock():
-        if not Library.objects.count():
+        if archive_path := os.getenv("TEST_DATASET_SNAPSHOT"):
+            # e.g. a large dataset of generate_data --snapshot archive, which stays
+            # in the reused test database: run with --create-db to drop it
+            restore_archive(Path(archive_path))
+        elif not Library.objects.count():
             call_command(
                 "generate_data",
                 libraries=3,
@@ -16,6 +25,8 @@ def django_db_setup(django_db_setup, django_db_createdb, django_db_blocker):
                 avg_readers=3,
                 max_readers=10,
                 persons=20,
+                seed=0,
+                snapshot="archive",
             )
 
 
@@ -70,8 +81,26 @@ def assert_django_queries():
         ```
         - In this mode you can set the kwargs `extra` if you want to allow extra queries.
 
-    Edge cases not handled:
-    - union queries
-    - queries that use a subquery in their FROM clause
+    Union queries are associated with the model of their first member, and queries
+    that use a subquery in their FROM clause with the model of the subquery.
     """
     return assert_django_queries_manager
+
+
+@pytest.fixture
+def assert_no_n_plus_one():
+    """
+    A fixture to fail a test when the same SELECT query, literals aside,
+    is executed several times (3 by default). The call-sites are reported.
+
+    Usage:
+
+        ```
+        with assert_no_n_plus_one():
+            client.get(url)
+
+        with assert_no_n_plus_one(threshold=10, allowed=["books.Person"]):
+            # do stuff
+        ```
+    """
+    return assert_no_n_plus_one_manager
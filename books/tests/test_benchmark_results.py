@@ -0,0 +1,23 @@
+import pytest
+
+from utils.benchmark_results import mann_whitney_p_value, min_p_value, percentile
+from utils.load_test import EndpointLoadResult
+
+
+def test_mann_whitney_p_value_exact():
+    assert mann_whitney_p_value([1, 2, 3], [4, 5, 6]) == min_p_value(3, 3)
+    assert mann_whitney_p_value([4, 5, 6], [1, 2, 3]) == min_p_value(3, 3)
+    assert mann_whitney_p_value([1, 3, 5], [2, 4, 6]) == pytest.approx(0.7)
+
+
+def test_mann_whitney_p_value_ties():
+    # U = 1.5 is rounded toward the mean: 2 * P(U <= 2), not 2 * P(U <= 1)
+    assert mann_whitney_p_value([1, 2, 3], [2, 5, 6]) == pytest.approx(0.4)
+    assert mann_whitney_p_value([2, 5, 6], [1, 2, 3]) == pytest.approx(0.4)
+
+
+def test_percentile():
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([1.0, 2.0, 3.0], 50) == 2.0
+    assert EndpointLoadResult("/", latencies=[1.0, 2.0, 3.0]).percentile(50) == 2.0
+    assert EndpointLoadResult("/").percentile(99) == 0.0
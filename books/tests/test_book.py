@@ -1,10 +1,13 @@
+import re
 from datetime import timedelta
 
 import pytest
 from django.db import transaction
+from django.db.models import Count
 from rest_framework.test import APIClient
 
-from books.models import Book, BookTag, Library
+from books.models import Book, BookTag, Library, Review
+from books.selectors.person import author_stats
 
 
 pytestmark = pytest.mark.django_db
@@ -17,7 +20,8 @@ def test_lib_count():
 def test_book_per_reader(django_assert_num_queries):
     client = APIClient()
     library = Library.objects.first()
-    with django_assert_num_queries(2):
+    # the books and their readers are joined
+    with django_assert_num_queries(1):
         result = client.get(f"/books/{library.id}/readers-per-book")
     data = result.json()
     assert len(data) > 10
@@ -48,3 +52,95 @@ def test_queries_2(assert_django_queries):
 
         BookTag.objects.filter(book=book).delete()
         BookTag.objects.create(name="braille", book=book, library=library)
+
+
+def test_queries_union(assert_django_queries):
+    with assert_django_queries(["books.Book:SELECT"]):
+        list(
+            Book.objects.filter(id=1)
+            .values("id")
+            .union(Review.objects.filter(id=1).values("id"))
+        )
+
+
+def test_queries_subquery_in_from(assert_django_queries):
+    with assert_django_queries(["books.Review:SELECT"]):
+        Review.objects.values("book_id").annotate(n=Count("id")).aggregate(
+            total=Count("n")
+        )
+
+
+def test_books_aggregate_author_name_filters():
+    client = APIClient()
+    book = Book.objects.select_related("author").first()
+    url = f"/books/{book.library_id}/aggregate"
+
+    iexact = client.get(url, {"author__name__iexact": book.author.name.upper()}).json()
+    icontains = client.get(url, {"author__name__icontains": book.author.name[1:-1]})
+    assert iexact
+    assert {result["author"]["id"] for result in iexact} == {book.author_id}
+    assert len(icontains.json()) >= len(iexact)
+
+
+def test_books_aggregate_tag_filters():
+    client = APIClient()
+    library = Library.objects.first()
+    url = f"/books/{library.id}/aggregate"
+    books = Book.objects.filter(library=library)
+
+    def get_ids(params):
+        response = client.get(url, {**params, "per_page": 100})
+        assert response.status_code == 200
+        return {result["id"] for result in response.json()}
+
+    any_tag = get_ids({"tags": "audio,braille"})
+    all_tags = get_ids({"tags__all": "audio,braille"})
+    assert any_tag == set(
+        books.filter(tags__name__in=["audio", "braille"]).values_list("id", flat=True)
+    )
+    assert all_tags == set(
+        books.filter(tags__name="audio")
+        .filter(tags__name="braille")
+        .values_list("id", flat=True)
+    )
+    assert all_tags and all_tags < any_tag
+    assert client.get(url, {"tags": "audio,unknown"}).status_code == 400
+
+
+def test_author_stats_engines():
+    client = APIClient()
+    library = Library.objects.first()
+    url = f"/authors/{library.id}/stats"
+
+    stats_by_engine = {}
+    for engine in ("aggregate", "subquery", None):
+        # the next links keep the query params
+        params = {"per_page": 5, **({"engine": engine} if engine else {})}
+        response = client.get(url, params)
+        stats = []
+        for _ in range(100):
+            assert response.status_code == 200
+            stats += response.json()
+            next_link = re.search(r'<([^>]*)>; rel="next"', response.get("Link", ""))
+            if next_link is None:
+                break
+            response = client.get(next_link.group(1))
+        else:
+            pytest.fail("too many pages")
+        stats_by_engine[engine] = stats
+
+    assert stats_by_engine["aggregate"] == stats_by_engine["subquery"]
+    assert stats_by_engine[None] == stats_by_engine["subquery"]
+    assert len(stats_by_engine["aggregate"]) == (
+        Book.objects.filter(library=library).values("author_id").distinct().count()
+    )
+
+
+def test_author_stats_engine_depends_on_page_depth(monkeypatch):
+    monkeypatch.setattr(author_stats, "AGGREGATE_MAX_SKIPPED_BOOKS", 2)
+    book = Book.objects.order_by("-author_id").first()
+
+    first_page = author_stats.list_author_stats(book.library_id)
+    deep_page = author_stats.list_author_stats(book.library_id, after_id=book.author_id)
+    assert "GROUP BY" in str(first_page.query)
+    assert "EXISTS" in str(deep_page.query)
@@ -0,0 +1,102 @@
+import pytest
+from django.db.models import Count
+from rest_framework.test import APIClient
+
+from books.models import Book, BookTag
+from books.models.book_tag import get_tag_mask, get_tag_names
+from books.selectors.book.list_books import (
+    filter_books_by_tags,
+    list_books_aggregate,
+    list_books_subquery,
+)
+
+
+pytestmark = pytest.mark.django_db
+
+
+def get_mask(book: Book) -> int:
+    return Book.objects.values_list("tag_mask", flat=True).get(pk=book.pk)
+
+
+def test_tag_mask_helpers():
+    assert get_tag_mask([]) == 0
+    mask = get_tag_mask(["audio", "braille"])
+    assert mask == get_tag_mask(["braille", "audio", "audio"])
+    assert get_tag_names(mask) == ["braille", "audio"]
+    assert get_tag_names(get_tag_mask(BookTag.TagName.values)) == (
+        BookTag.TagName.values
+    )
+
+
+def test_tag_mask_matches_the_tags():
+    for book in Book.objects.prefetch_related("tags"):
+        assert book.tag_mask == get_tag_mask(tag.name for tag in book.tags.all())
+
+
+def test_tag_mask_maintained_on_writes():
+    book = Book.objects.first()
+    BookTag.objects.filter(book=book).delete()
+    assert get_mask(book) == 0
+
+    tag = BookTag.objects.create(name="audio", book=book, library_id=book.library_id)
+    BookTag.objects.bulk_create(
+        [
+            BookTag(name=name, book=book, library_id=book.library_id)
+            for name in ("braille", "french")
+        ]
+    )
+    assert get_tag_names(get_mask(book)) == ["braille", "audio", "french"]
+
+    BookTag.objects.filter(pk=tag.pk).update(name="german")
+    assert get_tag_names(get_mask(book)) == ["braille", "french", "german"]
+
+    tag.refresh_from_db()
+    tag.delete()
+    BookTag.objects.filter(book=book, name="french").delete()
+    assert get_tag_names(get_mask(book)) == ["braille"]
+
+
+def test_tag_mask_kept_on_book_save():
+    book = Book.objects.first()
+    BookTag.objects.filter(book=book).delete()
+    book.refresh_from_db()
+    BookTag.objects.create(name="movie", book=book, library_id=book.library_id)
+
+    # the stale mask of the instance is not written back
+    book.title = "renamed"
+    book.save()
+    assert get_tag_names(get_mask(book)) == ["movie"]
+
+
+def test_list_books_selectors_tag_names():
+    books = Book.objects.order_by("id")
+    aggregate = {book.id: book.tag_names for book in list_books_aggregate(books)}
+    subquery = {book.id: book.tag_names for book in list_books_subquery(books)}
+
+    assert aggregate == subquery
+    assert aggregate == {book.id: get_tag_names(book.tag_mask) for book in books}
+    assert [] in aggregate.values()
+
+
+def test_filter_books_by_tags():
+    books = Book.objects.annotate(tag_count=Count("tags"))
+    all_tags = filter_books_by_tags(books, ["audio", "braille"])
+    any_tag = filter_books_by_tags(books, ["audio", "braille"], match_all=False)
+
+    assert set(all_tags) == set(
+        books.filter(tags__name="audio").filter(tags__name="braille")
+    )
+    assert set(any_tag) == set(
+        books.filter(tags__name__in=["audio", "braille"]).distinct()
+    )
+    assert all_tags and len(any_tag) > len(all_tags)
+
+
+def test_books_aggregate_counts():
+    book = Book.objects.annotate(tag_count=Count("tags")).filter(tag_count__gt=1)[0]
+    response = APIClient().get(f"/books/{book.library_id}/aggregate", {"per_page": 100})
+    (result,) = [result for result in response.json() if result["id"] == book.id]
+
+    # not multiplied by the number of tags
+    assert result["review_count"] == book.reviews.count()
+    assert set(result["tag_names"]) == set(book.tags.values_list("name", flat=True))
@@ -0,0 +1,169 @@
+import threading
+
+import pytest
+from django.db import IntegrityError, connection, models, transaction
+from django.test.utils import isolate_apps
+
+from books.management.commands.generate_data_scripts.bulk_creator import (
+    BatchStats,
+    BulkCreator,
+)
+from books.models import Person
+
+
+@pytest.mark.django_db
+def test_bulk_creator_ignore_conflicts(django_assert_num_queries):
+    existing = Person.objects.first()
+    with django_assert_num_queries(1), BulkCreator(
+        Person, batch_size=10, ignore_conflicts=True, unique_fields=["email"]
+    ) as bulk_creator:
+        bulk_creator.add_many(
+            [
+                Person(name="first", email="first@example.com"),
+                Person(name="conflict", email=existing.email),
+                Person(name="second", email="second@example.com"),
+                Person(name="duplicate", email="first@example.com"),
+            ]
+        )
+    assert bulk_creator.stats == BatchStats(inserted=2, skipped=2)
+    # the other rows of the batch are inserted, with their pks
+    assert [person.name for person in bulk_creator.results] == ["first", "second"]
+    for person in bulk_creator.results:
+        assert Person.objects.get(pk=person.pk).email == person.email
+    existing.refresh_from_db()
+    assert existing.name != "conflict"
+
+
+@pytest.mark.django_db
+def test_bulk_creator_update_conflicts():
+    existing = Person.objects.first()
+    with BulkCreator(
+        Person,
+        batch_size=2,
+        update_conflicts=True,
+        unique_fields=["email"],
+        update_fields=["name"],
+    ) as bulk_creator:
+        bulk_creator.add_many(
+            [
+                Person(name="updated", email=existing.email),
+                Person(name="new", email="new@example.com"),
+                Person(name="new again", email="new@example.com"),
+            ]
+        )
+    assert bulk_creator.batch_stats == [
+        BatchStats(inserted=1, updated=1),
+        BatchStats(updated=1),
+    ]
+    assert [person.pk for person in bulk_creator.results[:1]] == [existing.pk]
+    existing.refresh_from_db()
+    assert existing.name == "updated"
+    assert Person.objects.get(email="new@example.com").name == "new again"
+
+
+@pytest.mark.django_db
+def test_bulk_creator_ignore_conflicts_on_unique_fields_only():
+    existing = Person.objects.first()
+    # conflicts on the pk are not ignored
+    with pytest.raises(IntegrityError), transaction.atomic():
+        with BulkCreator(
+            Person, ignore_conflicts=True, unique_fields=["email"]
+        ) as bulk_creator:
+            bulk_creator.add(Person(pk=existing.pk, email="new@example.com"))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("update_conflicts", [False, True])
+@isolate_apps("books")
+def test_bulk_creator_null_unique_fields(update_conflicts):
+    class Isbn(models.Model):
+        code = models.TextField(unique=True, null=True)
+        name = models.TextField()
+
+        class Meta:
+            app_label = "books"
+
+    with connection.schema_editor() as schema_editor:
+        schema_editor.create_model(Isbn)
+    Isbn.objects.create(code="known", name="known")
+
+    with BulkCreator(
+        Isbn,
+        ignore_conflicts=not update_conflicts,
+        update_conflicts=update_conflicts,
+        unique_fields=["code"],
+        update_fields=["name"],
+    ) as bulk_creator:
+        bulk_creator.add_many(
+            [
+                Isbn(code=None, name="first"),
+                Isbn(code="known", name="conflict"),
+                Isbn(code=None, name="second"),
+            ]
+        )
+
+    # the rows without a code are not deduplicated
+    without_code = [isbn for isbn in bulk_creator.results if isbn.code is None]
+    assert [isbn.name for isbn in without_code] == ["first", "second"]
+    for isbn in without_code:
+        assert Isbn.objects.get(pk=isbn.pk).name == isbn.name
+    assert Isbn.objects.filter(code=None).count() == 2
+    assert bulk_creator.stats.inserted == 2
+
+
+def test_bulk_creator_requires_unique_fields():
+    with pytest.raises(ValueError):
+        BulkCreator(Person, ignore_conflicts=True)
+
+
+class RecordingBulkCreator(BulkCreator):
+    """Record the written batches instead of inserting them."""
+
+    def __init__(self, *args, fail_on_batch: int | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.written: list[list[str]] = []
+        self.writer_threads: set[str] = set()
+        self.fail_on_batch = fail_on_batch
+
+    def _write(self, batch):
+        if len(self.written) == self.fail_on_batch:
+            raise RuntimeError("write failed")
+        self.writer_threads.add(threading.current_thread().name)
+        self.written.append([person.name for person in batch])
+
+
+def test_bulk_creator_pipelined():
+    names = [str(index) for index in range(25)]
+    with RecordingBulkCreator(Person, batch_size=10, pipelined=True) as bulk_creator:
+        bulk_creator.add_many(Person(name=name) for name in names)
+    # written in order, by the writer thread
+    assert sum(bulk_creator.written, []) == names
+    assert [len(batch) for batch in bulk_creator.written] == [10, 10, 5]
+    assert bulk_creator.writer_threads == {"BulkCreator-Person"}
+
+
+def test_bulk_creator_pipelined_error():
+    with pytest.raises(RuntimeError, match="write failed"):
+        with RecordingBulkCreator(
+            Person, batch_size=10, pipelined=True, queue_size=1, fail_on_batch=1
+        ) as bulk_creator:
+            bulk_creator.add_many(Person(name=str(index)) for index in range(100))
+    assert len(bulk_creator.written) == 1
+
+
+@pytest.mark.django_db
+def test_bulk_creator_pipelined_in_atomic():
+    with pytest.raises(RuntimeError):
+        with BulkCreator(Person, pipelined=True):
+            pass
+
+
+def test_bulk_creator_adaptive_batch_size():
+    bulk_creator = BulkCreator(Person, batch_size=2_000, target_flush_seconds=0.5)
+    bulk_creator._adapt_batch_size(duration=0.1, rows=2_000)
+    assert bulk_creator.batch_size == 10_000
+    # smoothed
+    bulk_creator._adapt_batch_size(duration=1.0, rows=10_000)
+    assert 5_000 < bulk_creator.batch_size < 10_000
+    bulk_creator._adapt_batch_size(duration=100, rows=100)
+    assert bulk_creator.batch_size == BulkCreator.min_batch_size
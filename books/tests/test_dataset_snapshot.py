@@ -0,0 +1,50 @@
+import json
+import zipfile
+
+import pytest
+
+from books.models import Book, Library, Review
+from utils.dataset_snapshot import (
+    MANIFEST_NAME,
+    SnapshotError,
+    dump_archive,
+    restore_archive,
+)
+
+
+pytestmark = pytest.mark.django_db
+
+
+def test_dump_and_restore_archive(tmp_path):
+    path = tmp_path / "snapshot.zip"
+    dump_archive(path)
+    counts = (Library.objects.count(), Book.objects.count(), Review.objects.count())
+    review_ids = list(Review.objects.order_by("id").values_list("id", flat=True))
+
+    Review.objects.all().delete()
+    Library.objects.create(name="not in the snapshot")
+    restore_archive(path)
+
+    assert (
+        Library.objects.count(),
+        Book.objects.count(),
+        Review.objects.count(),
+    ) == counts
+    assert list(Review.objects.order_by("id").values_list("id", flat=True)) == (
+        review_ids
+    )
+    # sequences are reset after the restored rows
+    assert Library.objects.create(name="new").id > max(
+        Library.objects.exclude(name="new").values_list("id", flat=True)
+    )
+
+
+def test_restore_archive_other_migrations(tmp_path):
+    path = tmp_path / "snapshot.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(
+            MANIFEST_NAME, json.dumps({"migrations": ["books.0001"], "tables": []})
+        )
+    with pytest.raises(SnapshotError):
+        restore_archive(path)
+    assert Library.objects.exists()
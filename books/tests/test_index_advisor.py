@@ -0,0 +1,106 @@
+from dataclasses import replace
+
+import pytest
+
+from books.views.book.list_books_aggregate import BookFilter
+from books.views.review.filtered import ReviewFilter
+from utils.index_advisor import (
+    find_droppable_indexes,
+    find_missing_indexes,
+    find_redundant_indexes,
+    get_index_usage,
+)
+from utils.index_experiment import IndexConfiguration, index_configuration
+from utils.sql import disable_indexes, get_index_validity
+
+
+pytestmark = pytest.mark.django_db
+
+
+def test_redundant_foreign_key_index():
+    redundant = find_redundant_indexes(get_index_usage())
+    reasons = {
+        recommendation.index_name: recommendation.reason for recommendation in redundant
+    }
+    book_library_index = next(name for name in reasons if "book_library_id" in name)
+    assert "book_library_release_date_idx" in reasons[book_library_index]
+    # the pattern ops index is not interchangeable with the unique index on email
+    assert not any(name.endswith("_like") for name in reasons)
+
+
+def test_covering_index_kept_when_never_scanned():
+    # the book indexes starting with library_id, which cover its foreign key index,
+    # have no scans
+    indexes = [
+        replace(index, scans=0)
+        if index.index_name.startswith("book_library_")
+        else index
+        for index in get_index_usage()
+    ]
+    dropped = {
+        recommendation.index_name: recommendation
+        for recommendation in find_droppable_indexes(indexes)
+    }
+    book_library_index = next(name for name in dropped if "book_library_id" in name)
+    covering_index = dropped[book_library_index].covering_index_name
+    assert covering_index.startswith("book_library_")
+    assert covering_index not in dropped
+
+
+def test_missing_filter_indexes():
+    missing = find_missing_indexes(get_index_usage(), [ReviewFilter, BookFilter])
+    index_names = {recommendation.index_name for recommendation in missing}
+    assert "review_library_rating_idx" in index_names
+    # covered by book_library_release_date_idx and unique_book_per_library
+    assert not any(name.startswith("book_") for name in index_names)
+    # author__name__iexact is covered by person_upper_name_idx
+    assert not any(name.startswith("person_") for name in index_names)
+
+
+def test_missing_upper_index():
+    indexes = [
+        index
+        for index in get_index_usage()
+        if index.index_name != "person_upper_name_idx"
+    ]
+    missing = find_missing_indexes(indexes, [BookFilter])
+    assert [
+        (recommendation.index_name, recommendation.sql) for recommendation in missing
+    ] == [
+        (
+            "person_upper_name_idx",
+            'CREATE INDEX CONCURRENTLY "person_upper_name_idx" '
+            'ON "books_person" ((upper(name)));',
+        )
+    ]
+
+
+def test_disable_indexes_restores_on_error():
+    with pytest.raises(ZeroDivisionError):
+        with disable_indexes("book_library_release_date_idx"):
+            assert not get_index_validity("book_library_release_date_idx")[
+                "book_library_release_date_idx"
+            ]
+            1 / 0
+    assert get_index_validity("book_library_release_date_idx") == {
+        "book_library_release_date_idx": True
+    }
+
+
+def test_index_configuration_is_rolled_back():
+    configuration = IndexConfiguration(
+        name="experiment",
+        disable=["book_library_release_date_idx"],
+        create=["CREATE INDEX experiment_idx ON books_book (release_date)"],
+    )
+    with pytest.raises(ZeroDivisionError):
+        with index_configuration(configuration):
+            index_names = {index.index_name for index in get_index_usage()}
+            assert "experiment_idx" in index_names
+            1 / 0
+
+    index_names = {index.index_name for index in get_index_usage()}
+    assert "experiment_idx" not in index_names
+    assert get_index_validity("book_library_release_date_idx") == {
+        "book_library_release_date_idx": True
+    }
@@ -0,0 +1,61 @@
+import tracemalloc
+
+import pytest
+
+from books.models import Person
+from utils.memory_consumption import (
+    MemoryReport,
+    measure_ram_consumption,
+    memory_profile,
+)
+
+
+pytestmark = pytest.mark.django_db
+
+
+def test_memory_profile_context_manager():
+    with memory_profile(top=3, print_report=False) as profile:
+        persons = list(Person.objects.all())
+        kept = [bytearray(2**20)]
+
+    report = profile.report
+    assert report.instances_created == {"books.Person": len(persons)}
+    assert report.net >= 2**20
+    assert report.peak >= report.net
+    assert report.rss_start > 0
+    assert report.rss_high_water_mark >= report.rss_start
+    assert 0 < len(report.top_allocations) <= 3
+    assert all(
+        isinstance(stat, tracemalloc.StatisticDiff) for stat in report.top_allocations
+    )
+    assert "books.Person" in str(report)
+    assert kept
+    # tracing is stopped when it was not started before the block
+    assert not tracemalloc.is_tracing()
+
+
+def test_memory_profile_decorator():
+    profile = memory_profile(top=0, print_report=False)
+
+    @profile
+    def allocate():
+        data = bytearray(2**20)
+        del data
+
+    allocate()
+    assert profile.report.peak >= 2**20
+    # freed at the end of the call
+    assert profile.report.net < 2**20
+    assert profile.report.top_allocations == []
+
+    # a new report for each call
+    allocate()
+    assert profile.report.peak >= 2**20
+    assert not profile.report.instances_created
+
+
+def test_measure_ram_consumption(capsys):
+    report = measure_ram_consumption(lambda: list(Person.objects.all()))
+    assert isinstance(report, MemoryReport)
+    assert report.instances_created["books.Person"] == Person.objects.count()
+    assert "Python allocations" in capsys.readouterr().out
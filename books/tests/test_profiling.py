@@ -0,0 +1,21 @@
+import pytest
+
+from books.models import Library
+
+
+pytestmark = pytest.mark.django_db
+
+
+def test_profiling_middleware(client, settings, tmp_path):
+    settings.PROFILING_TOKEN = "secret"
+    settings.PROFILING_DIR = tmp_path
+    settings.MIDDLEWARE = ["utils.profiling.ProfilingMiddleware", *settings.MIDDLEWARE]
+    library = Library.objects.first()
+
+    response = client.get(f"/books/{library.id}/aggregate", HTTP_X_PROFILE="secret")
+    assert response.status_code == 200
+    assert "sql;dur=" in response["Server-Timing"]
+    assert (tmp_path / response["X-Profile-File"]).exists()
+
+    response = client.get(f"/books/{library.id}/aggregate?profile=wrong")
+    assert not response.has_header("Server-Timing")
@@ -0,0 +1,107 @@
+import pytest
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from books.models import Book, Library
+from books.selectors.book.reader_per_book import list_readers_per_book
+from utils.n_plus_one import NPlusOneException
+from utils.perf_display import perf_counter
+from utils.query_capture import (
+    QueryCaptureMiddleware,
+    QueryRecorder,
+    capture_queries,
+    fingerprint_sql,
+    global_recorder,
+)
+
+
+pytestmark = pytest.mark.django_db
+
+
+def test_fingerprint_strips_literals():
+    assert fingerprint_sql(
+        "SELECT * FROM books_book WHERE id = 12 AND title = 'it''s'  LIMIT 21"
+    ) == fingerprint_sql(
+        "SELECT * FROM books_book WHERE id = %s AND title = %s LIMIT 1"
+    )
+    assert fingerprint_sql("SELECT 1 WHERE id IN (%s, %s, %s)") == fingerprint_sql(
+        "SELECT 1 WHERE id IN (%s)"
+    )
+    assert fingerprint_sql('SAVEPOINT "s1_x1"') == fingerprint_sql('SAVEPOINT "s2_x9"')
+
+
+def test_capture_queries_without_debug(settings):
+    settings.DEBUG = False
+    library_ids = list(Library.objects.values_list("id", flat=True))
+    with capture_queries() as recorder:
+        for library_id in library_ids:
+            Book.objects.filter(library_id=library_id).first()
+
+    assert recorder.total_count == len(library_ids)
+    assert len(recorder.stats) == 1
+    assert recorder.top(1)[0].count == len(library_ids)
+
+
+def test_recorder_is_bounded():
+    recorder = QueryRecorder(max_queries=2, max_fingerprints=1)
+    for table in ["a", "b", "c"]:
+        recorder.record(f"SELECT * FROM {table}", None, 0.1)
+
+    assert [query.sql for query in recorder.queries] == [
+        "SELECT * FROM b",
+        "SELECT * FROM c",
+    ]
+    assert recorder.stats[QueryRecorder.OVERFLOW_KEY].count == 2
+
+
+def test_capture_queries_on_every_alias():
+    with capture_queries(using=None) as recorder:
+        for alias in connections:
+            assert recorder in connections[alias].execute_wrappers
+        Book.objects.using("default").first()
+
+    assert not any(
+        recorder in connections[alias].execute_wrappers for alias in connections
+    )
+    assert [query.using for query in recorder.queries] == ["default"]
+
+
+def test_middleware_captures_every_alias():
+    def get_response(request):
+        assert all(
+            global_recorder in connections[alias].execute_wrappers
+            for alias in connections
+        )
+        return HttpResponse()
+
+    QueryCaptureMiddleware(get_response)(RequestFactory().get("/"))
+
+
+def test_perf_counter_prints_the_skipped_queries(capsys):
+    with perf_counter(time_sql=True, print_sql=True) as recorder:
+        for index in range(1_002):
+            recorder.record(f"SELECT {index}", None, 0.0)
+
+    output = capsys.readouterr().out
+    assert "2 earlier queries not kept" in output
+    assert "SELECT 0" not in output and "SELECT 1001" in output
+
+
+def test_n_plus_one_detected(assert_no_n_plus_one):
+    library = Library.objects.first()
+    with pytest.raises(NPlusOneException) as exc_info:
+        with assert_no_n_plus_one():
+            [book.author.name for book in Book.objects.filter(library=library)]
+
+    (repeated_query,) = exc_info.value.repeated_queries
+    assert repeated_query.target == "books.Person"
+    assert repeated_query.count == Book.objects.filter(library=library).count()
+    assert "test_query_capture.py" in str(exc_info.value)
+
+
+def test_no_n_plus_one_with_prefetch(assert_no_n_plus_one):
+    library = Library.objects.first()
+    with assert_no_n_plus_one():
+        list(Book.objects.filter(library=library).prefetch_related("readers"))
+        list_readers_per_book(library.id)
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from books.models import Book
+from utils.replica_router import (
+    STICKY_COOKIE,
+    ReplicaMiddleware,
+    ReplicaRouter,
+    read_from_replicas,
+)
+
+
+@pytest.fixture
+def replicas(settings):
+    settings.DATABASE_REPLICAS = ["replica_0"]
+    settings.DATABASE_ROUTERS = ["utils.replica_router.ReplicaRouter"]
+    settings.REPLICA_STICKY_SECONDS = 5
+
+
+def test_replica_router(replicas):
+    router = ReplicaRouter()
+    assert router.db_for_read(Book) == "default"
+    assert Book.objects.all().db == "default"
+    with read_from_replicas():
+        assert Book.objects.all().db == "replica_0"
+        # the next reads see the write
+        assert router.db_for_write(Book) == "default"
+        assert Book.objects.all().db == "default"
+    assert not router.allow_migrate("replica_0", "books")
+
+
+def test_replica_middleware(replicas):
+    factory = RequestFactory()
+    databases = []
+
+    def get_response(request):
+        databases.append(Book.objects.all().db)
+        if "write" in request.GET:
+            # as done by save()
+            ReplicaRouter().db_for_write(Book)
+        return HttpResponse()
+
+    middleware = ReplicaMiddleware(get_response)
+    assert STICKY_COOKIE not in middleware(factory.get("/")).cookies
+    response = middleware(factory.get("/", {"write": 1}))
+    assert float(response.cookies[STICKY_COOKIE].value) > time.time()
+    assert STICKY_COOKIE in middleware(factory.post("/")).cookies
+
+    # reads of the client are sent to the primary until the cookie expires
+    request = factory.get("/")
+    request.COOKIES[STICKY_COOKIE] = response.cookies[STICKY_COOKIE].value
+    middleware(request)
+    assert databases == ["replica_0", "replica_0", "default", "default"]
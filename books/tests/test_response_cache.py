@@ -0,0 +1,86 @@
+import pytest
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.test import APIClient
+
+from books.models import Library, Review
+from utils.response_cache import (
+    RESPONSE_CACHE_ALIAS,
+    RESPONSE_VERSION_CACHE_ALIAS,
+    get_library_version,
+    invalidate_library,
+)
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def response_cache(settings):
+    settings.RESPONSE_CACHE_ENABLED = True
+    caches[RESPONSE_CACHE_ALIAS].clear()
+    yield
+    caches[RESPONSE_CACHE_ALIAS].clear()
+
+
+def test_response_cache(
+    response_cache, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    client = APIClient()
+    library = Library.objects.first()
+    url = f"/reviews/{library.id}/complete"
+
+    response = client.get(url, {"rating__gte": 2, "ordering": "-id"})
+    assert response["X-Cache"] == "miss"
+    # the order of the query params doesn't matter, only the version is queried
+    with django_assert_num_queries(1):
+        cached = client.get(url, {"ordering": "-id", "rating__gte": 2})
+    assert cached["X-Cache"] == "hit"
+    assert cached.content == response.content
+    assert cached["Link"] == response["Link"]
+    assert client.get(url, {"rating__gte": 3})["X-Cache"] == "miss"
+
+    with django_assert_num_queries(1):
+        not_modified = client.get(
+            url,
+            {"rating__gte": 2, "ordering": "-id"},
+            HTTP_IF_NONE_MATCH=cached["ETag"],
+        )
+    assert not_modified.status_code == 304
+
+    # a write in the library invalidates its responses, once committed
+    with django_capture_on_commit_callbacks(execute=True):
+        Review.objects.filter(library=library).first().save()
+    response = client.get(
+        url, {"rating__gte": 2, "ordering": "-id"}, HTTP_IF_NONE_MATCH=cached["ETag"]
+    )
+    assert response.status_code == 200
+    assert response["X-Cache"] == "miss"
+    assert response["ETag"] != cached["ETag"]
+
+    other_library = Library.objects.exclude(id=library.id).first()
+    other_url = f"/books/{other_library.id}/aggregate"
+    assert client.get(other_url)["X-Cache"] == "miss"
+    with django_capture_on_commit_callbacks(execute=True):
+        Review.objects.filter(library=library).first().delete()
+    assert client.get(other_url)["X-Cache"] == "hit"
+
+
+def test_library_versions_shared_by_processes(response_cache):
+    library = Library.objects.first()
+    version = get_library_version(library.id)
+    # another process only shares the versions, not its local memory responses
+    caches[RESPONSE_CACHE_ALIAS].clear()
+    assert get_library_version(library.id) == version
+    invalidate_library(library.id)
+    caches[RESPONSE_CACHE_ALIAS].clear()
+    assert get_library_version(library.id) > version
+    assert not isinstance(caches[RESPONSE_VERSION_CACHE_ALIAS], LocMemCache)
+
+
+def test_response_cache_disabled(settings):
+    settings.RESPONSE_CACHE_ENABLED = False
+    library = Library.objects.first()
+    response = APIClient().get(f"/books/{library.id}/readers-per-book")
+    assert response.status_code == 200
+    assert not response.has_header("ETag")
@@ -0,0 +1,34 @@
+import pytest
+
+from books.models import Book, Library
+from books.selectors.iteration import iterate_chunks, iterate_rows
+
+
+pytestmark = pytest.mark.django_db
+
+
+def test_iterate_rows_prefetch_per_chunk(django_assert_num_queries):
+    library = Library.objects.first()
+    books = Book.objects.filter(library=library).order_by("id")
+    book_count = books.count()
+    chunk_size = 10
+    chunk_count = -(-book_count // chunk_size)
+
+    # the books query, then a readers query per chunk
+    with django_assert_num_queries(1 + chunk_count):
+        readers = {
+            book.id: {reader.id for reader in book.readers.all()}
+            for book in iterate_rows(books.prefetch_related("readers"), chunk_size)
+        }
+    assert list(readers) == list(books.values_list("id", flat=True))
+    book = books.last()
+    assert readers[book.id] == set(book.readers.values_list("id", flat=True))
+
+
+def test_iterate_chunks_values_list(django_assert_num_queries):
+    books = Book.objects.order_by("id").values_list("id", "title")
+    with django_assert_num_queries(1):
+        chunks = list(iterate_chunks(books, chunk_size=7))
+    assert {len(chunk) for chunk in chunks[:-1]} == {7}
+    assert 0 < len(chunks[-1]) <= 7
+    assert sum(chunks, []) == list(books)
@@ -2,6 +2,7 @@ from django.urls import path
 
 from .views.book.list_books_aggregate import ListAnnotatedBooks
 from .views.book.reader_per_book import ListReaderPerBookView
+from .views.person.author_stats import ListAuthorStatsView
 from .views.review import (
     CompleteListReviewsView,
     FilteredListReviewsView,
@@ -21,6 +22,11 @@ urlpatterns = [
         ListAnnotatedBooks.as_view(),
         name="list-books-aggregate",
     ),
+    path(
+        "authors/<int:library_id>/stats",
+        ListAuthorStatsView.as_view(),
+        name="list-author-stats",
+    ),
     path(
         "reviews/<int:library_id>/simple",
         ListReviewsView.as_view(),
@@ -6,18 +6,42 @@ from rest_framework.filters import OrderingFilter
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 
-from books.models import Book
-from books.selectors.book.list_books import list_books_aggregate
+from books.models import Book, BookTag
+from books.selectors.book.list_books import filter_books_by_tags, list_books_aggregate
 from books.views.utils.pagination import NoCountHeaderPagination
+from utils.response_cache import cache_library_response
+
+
+class TagNameInFilter(filters.BaseInFilter, filters.ChoiceFilter):
+    """Comma separated tag names, e.g. ?tags__all=audio,braille"""
+
+    def __init__(self, *args, **kwargs):
+        # on tag_mask for the index advisor, served by book_library_tag_mask_idx
+        kwargs.setdefault("field_name", "tag_mask")
+        kwargs.setdefault("lookup_expr", "in")
+        super().__init__(*args, choices=BookTag.TagName.choices, **kwargs)
 
 
 class BookFilter(filters.FilterSet):
+    # books with any of the tags, and with all of them
+    tags = TagNameInFilter(method="filter_any_tags")
+    tags__all = TagNameInFilter(method="filter_all_tags")
+
+    def filter_any_tags(self, queryset, name, value):
+        return filter_books_by_tags(queryset, value, match_all=False)
+
+    def filter_all_tags(self, queryset, name, value):
+        return filter_books_by_tags(queryset, value)
+
     class Meta:
         model = Book
         fields = {
             "release_date": ["gte", "lte", "lt", "gt"],
             "author_id": ["exact", "in"],
-            "author__name": ["iexact"],
+            # served by person_upper_name_idx, and by the optional trigram
+            # indexes of the 0005 migration for icontains
+            "author__name": ["iexact", "icontains"],
+            "title": ["icontains"],
         }
 
 
@@ -39,6 +63,7 @@ def serialize_books(books):
 class ListAnnotatedBooks(GenericAPIView):
     pagination_class = NoCountHeaderPagination
     filter_backends = (filters.DjangoFilterBackend, OrderingFilter)
+    filterset_class = BookFilter
     ordering_fields = ["release_date", "id"]
     ordering = ["release_date"]
 
@@ -50,6 +75,7 @@ class ListAnnotatedBooks(GenericAPIView):
         queryset = list_books_aggregate(queryset)
         return self.paginate_queryset(queryset)
 
+    @cache_library_response
     def get(self, request, library_id: int) -> Response:
         """
         Similar to rest_framework.mixins.ListModelMixin
@@ -2,8 +2,10 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from books.selectors.book.reader_per_book import list_readers_per_book
+from utils.response_cache import cache_library_response
 
 
 class ListReaderPerBookView(APIView):
+    @cache_library_response
     def get(self, request, library_id: int) -> Response:
         return Response(list_readers_per_book(library_id), 200)
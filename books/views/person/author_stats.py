@@ -0,0 +1,45 @@
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.generics import GenericAPIView
+from rest_framework.response import Response
+
+from books.selectors.person.author_stats import AUTHOR_STATS_ENGINES, list_author_stats
+from books.views.utils.pagination import KeysetPagination
+
+
+def serialize_author_stats(authors):
+    return [
+        {
+            "id": author.id,
+            "name": author.name,
+            "book_count": author.book_count,
+            "review_count": author.review_count,
+            "average_rating": author.average_rating,
+        }
+        for author in authors
+    ]
+
+
+class ListAuthorStatsView(GenericAPIView):
+    pagination_class = KeysetPagination
+
+    def get(self, request, library_id: int) -> Response:
+        """
+        The `engine` query param forces "aggregate" or "subquery",
+        see list_author_stats
+        """
+        engine = request.query_params.get("engine")
+        if engine is not None and engine not in AUTHOR_STATS_ENGINES:
+            raise ValidationError({"engine": f"one of {list(AUTHOR_STATS_ENGINES)}"})
+        # the engine depends on the depth of the page
+        after_id = before_id = None
+        cursor = self.paginator.decode_cursor(request)
+        if cursor is not None and cursor.position is not None:
+            if not cursor.position.isdigit():
+                raise NotFound(self.paginator.invalid_cursor_message)
+            if cursor.reverse:
+                before_id = int(cursor.position)
+            else:
+                after_id = int(cursor.position)
+        queryset = list_author_stats(library_id, after_id, before_id, engine)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serialize_author_stats(page))
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 
 from books.models import Review
 from books.views.utils.pagination import NoCountHeaderPagination
+from utils.response_cache import cache_library_response
 
 
 class ListReviewsView(GenericAPIView):
@@ -12,6 +13,7 @@ class ListReviewsView(GenericAPIView):
     def get_queryset(self, library_id) -> QuerySet:
         return Review.objects.filter(library_id=library_id)
 
+    @cache_library_response
     def get(self, request, library_id: int) -> Response:
         """
         Similar to rest_framework.mixins.ListModelMixin
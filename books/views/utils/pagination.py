@@ -1,6 +1,6 @@
 from django.core.paginator import Paginator
 from django.utils.functional import cached_property
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.utils.urls import remove_query_param, replace_query_param
 
@@ -77,3 +77,29 @@ class NoCountPaginator(Paginator):
 
 class NoCountHeaderPagination(LinkHeaderPagination):
     django_paginator_class = NoCountPaginator
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination: pages are filtered by the last id of the previous page,
+    so deep pages are as fast as the first one. Links are in the Link header.
+    """
+
+    ordering = "id"
+    page_size = 20
+    page_size_query_param = "per_page"
+    max_page_size = 100
+
+    def get_paginated_response(self, data):
+        links = [
+            '<{}>; rel="{}"'.format(url, label)
+            for url, label in (
+                (self.get_previous_link(), "prev"),
+                (self.get_next_link(), "next"),
+            )
+            if url is not None
+        ]
+        headers = {"Access-Control-Expose-Headers": "Link"}
+        if links:
+            headers["Link"] = ", ".join(links)
+        return Response(data, headers=headers)
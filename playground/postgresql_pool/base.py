@@ -0,0 +1,72 @@
+"""
+PostgreSQL backend taking its connections from a psycopg 3 pool, configured
+by OPTIONS["pool"] (the ConnectionPool arguments), like the "pool" option of
+Django 5.1+.
+
+Django closes the connection at the end of each request with CONN_MAX_AGE = 0,
+which here returns it to the pool of the process instead. The pool is opened
+on first use, so after gunicorn forked its workers.
+"""
+from threading import Lock
+
+from django.db.backends.postgresql import base
+from psycopg_pool import ConnectionPool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # a pool per database alias, shared by the threads of the process
+    _connection_pools: dict[str, ConnectionPool] = {}
+    _connection_pools_lock = Lock()
+
+    @property
+    def pool(self) -> ConnectionPool | None:
+        pool_options = self.settings_dict["OPTIONS"].get("pool")
+        if not pool_options or self.settings_dict["NAME"] is None:
+            # no pool for the connections to the "postgres" database
+            return None
+        with self._connection_pools_lock:
+            if self.alias not in self._connection_pools:
+                pool = ConnectionPool(
+                    kwargs=self.get_connection_params(),
+                    open=False,
+                    check=ConnectionPool.check_connection,
+                    name=self.alias,
+                    **pool_options,
+                )
+                pool.open(wait=True)
+                self._connection_pools[self.alias] = pool
+            return self._connection_pools[self.alias]
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        isolation_level = self.settings_dict["OPTIONS"].get("isolation_level")
+        connection = pool.getconn()
+        if isolation_level is None:
+            self.isolation_level = base.IsolationLevel.READ_COMMITTED
+        else:
+            self.isolation_level = base.IsolationLevel(isolation_level)
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if self.connection is None or pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            # rolled back by the pool if a transaction is in progress
+            pool.putconn(self.connection)
+        # even when closed within an atomic block, it can't be used anymore
+        self.connection = None
+
+    def close_pool(self):
+        with self._connection_pools_lock:
+            pool = self._connection_pools.pop(self.alias, None)
+        if pool is not None:
+            pool.close()
@@ -14,9 +14,6 @@ import os
 import sys
 from pathlib import Path
 
-import sentry_sdk
-from sentry_sdk.integrations.django import DjangoIntegration
-
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -41,16 +38,41 @@ ALLOWED_HOSTS = ["*"]
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql_psycopg2",
+        "ENGINE": "django.db.backends.postgresql",
         "NAME": os.environ.get("DATABASE_NAME", "django_playground"),
         "USER": os.environ.get("DATABASE_USER", "postgres"),
         "PASSWORD": os.environ.get("DATABASE_PASSWORD"),
         "HOST": os.environ.get("DATABASE_HOST", "localhost"),
         "PORT": int(os.environ.get("DATABASE_PORT", "54321")),
         "CONN_MAX_AGE": None,
+        "OPTIONS": {},
     }
 }
 
+# Connections taken from a pool of each process, returned at the end of requests,
+# see playground/postgresql_pool/base.py
+if DATABASE_POOL_MAX_SIZE := int(os.getenv("DATABASE_POOL_MAX_SIZE", "0")):
+    DATABASES["default"]["ENGINE"] = "playground.postgresql_pool"
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DATABASE_POOL_MIN_SIZE", "1")),
+        "max_size": DATABASE_POOL_MAX_SIZE,
+        "timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", "10")),
+    }
+
+# Server-side prepared statements of psycopg 3, for queries executed this number
+# of times on a connection, they require server-side parameters binding.
+# They don't work behind a pgbouncer in transaction mode, before its 1.21 version.
+if DATABASE_PREPARE_THRESHOLD := os.getenv("DATABASE_PREPARE_THRESHOLD"):
+    DATABASES["default"]["OPTIONS"]["server_side_binding"] = True
+    DATABASES["default"]["OPTIONS"]["prepare_threshold"] = int(
+        DATABASE_PREPARE_THRESHOLD
+    )
+
+
+# Lean mode for short-lived commands and test sessions: no Sentry, and only the
+# apps needed by the API, see `manage.py profile_startup --lean`
+LEAN_SETTINGS = bool(os.getenv("LEAN_SETTINGS"))
 
 # Application definition
 
@@ -64,6 +86,16 @@ INSTALLED_APPS = [
     "django_extensions",
     "books",
 ]
+# used by the admin, shell_plus, the static files of runserver and sessions
+LEAN_EXCLUDED_APPS = [
+    "django.contrib.admin",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+    "django_extensions",
+]
+if LEAN_SETTINGS:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in LEAN_EXCLUDED_APPS]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
@@ -74,6 +106,87 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
+# the authentication middleware requires the sessions
+LEAN_EXCLUDED_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+]
+if LEAN_SETTINGS:
+    MIDDLEWARE = [
+        middleware
+        for middleware in MIDDLEWARE
+        if middleware not in LEAN_EXCLUDED_MIDDLEWARE
+    ]
+
+# Safe requests read from these replicas, e.g. DATABASE_REPLICAS=localhost:54322,
+# and clients that just wrote read from the primary for REPLICA_STICKY_SECONDS,
+# see utils/replica_router.py
+DATABASE_REPLICAS = []
+for index, address in enumerate(
+    filter(None, os.getenv("DATABASE_REPLICAS", "").split(","))
+):
+    host, _, port = address.strip().partition(":")
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": int(port) if port else DATABASES["default"]["PORT"],
+        "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+        # tests use the default database instead
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{index}")
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ["utils.replica_router.ReplicaRouter"]
+    MIDDLEWARE.insert(0, "utils.replica_router.ReplicaMiddleware")
+
+# Record SQL queries timings in a bounded buffer, works with DEBUG = False
+# see utils/query_capture.py
+if os.getenv("QUERY_CAPTURE"):
+    MIDDLEWARE.append("utils.query_capture.QueryCaptureMiddleware")
+
+# Profile requests sent with this token in the X-Profile header or the profile
+# query param, see utils/profiling.py
+if PROFILING_TOKEN := os.getenv("PROFILING_TOKEN"):
+    MIDDLEWARE.insert(0, "utils.profiling.ProfilingMiddleware")
+PROFILING_DIR = BASE_DIR / "profiles"
+
+# Archives of generated datasets, see generate_data --snapshot
+DATASET_SNAPSHOT_DIR = Path(
+    os.getenv("DATASET_SNAPSHOT_DIR", BASE_DIR / "dataset_snapshots")
+)
+
+# Cache the responses of the list endpoints, see utils/response_cache.py
+RESPONSE_CACHE_ENABLED = bool(os.getenv("RESPONSE_CACHE"))
+# a bounded LRU in the memory of each process by default, a shared backend can be
+# used instead, e.g. RESPONSE_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# and RESPONSE_CACHE_LOCATION=redis://localhost:6379
+RESPONSE_CACHE_BACKEND = os.getenv(
+    "RESPONSE_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+)
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "responses": {
+        "BACKEND": RESPONSE_CACHE_BACKEND,
+        "LOCATION": os.getenv("RESPONSE_CACHE_LOCATION", "responses"),
+        "TIMEOUT": 3600,
+    },
+}
+if RESPONSE_CACHE_BACKEND.endswith("LocMemCache"):
+    # least recently used entries are evicted (a third of them) beyond this size
+    CACHES["responses"]["OPTIONS"] = {"MAX_ENTRIES": 2000}
+    # the versions bumped by writes must be seen by every process: they are stored
+    # in the database, in the table created by the 0007 migration
+    CACHES["response_versions"] = {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "response_cache_versions",
+        "TIMEOUT": None,
+        # a version per library
+        "OPTIONS": {"MAX_ENTRIES": 100_000},
+    }
+else:
+    CACHES["response_versions"] = CACHES["responses"]
 
 ROOT_URLCONF = "playground.urls"
 
@@ -161,7 +274,11 @@ SHELL_PLUS_PRINT_SQL_TRUNCATE = None
 SHELL_PLUS_PRINT_SQL = True  # TODO Change back to false to start
 
 
-if SENTRY_DSN := os.getenv("SENTRY_DSN"):
+if (SENTRY_DSN := os.getenv("SENTRY_DSN")) and not LEAN_SETTINGS:
+    # imported here, it takes ~80ms
+    import sentry_sdk
+    from sentry_sdk.integrations.django import DjangoIntegration
+
     sentry_sdk.init(
         dsn=SENTRY_DSN,
         integrations=[DjangoIntegration()],
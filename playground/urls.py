@@ -13,10 +13,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path
 
 from books.urls import urlpatterns as book_urlpatterns
 
 
-urlpatterns = [path("admin/", admin.site.urls), *book_urlpatterns]
+urlpatterns = [*book_urlpatterns]
+# not installed with LEAN_SETTINGS
+if apps.is_installed("django.contrib.admin"):
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path("admin/", admin.site.urls))
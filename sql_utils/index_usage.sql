@@ -0,0 +1,49 @@
+SELECT
+    pg_stat_user_indexes.relname AS table_name,
+    pg_stat_user_indexes.indexrelname AS index_name,
+    ARRAY (
+        SELECT
+            pg_attribute.attname
+        FROM
+            unnest(pg_index.indkey::int2[]) WITH ORDINALITY AS index_keys (attnum, position)
+            LEFT OUTER JOIN pg_attribute ON pg_attribute.attrelid = pg_index.indrelid
+                AND pg_attribute.attnum = index_keys.attnum
+        ORDER BY
+            index_keys.position) AS columns,
+    -- indexes with other operator classes (e.g. varchar_pattern_ops) are not interchangeable
+    pg_index.indclass::oid[] AS operator_classes,
+    pg_index.indisunique AS is_unique,
+    pg_index.indisprimary AS is_primary,
+    EXISTS (
+        SELECT
+            1
+        FROM
+            pg_constraint
+        WHERE
+            pg_constraint.conindid = pg_index.indexrelid) AS backs_constraint,
+    EXISTS (
+        SELECT
+            1
+        FROM
+            pg_constraint
+        WHERE
+            pg_constraint.contype = 'f'
+            AND pg_constraint.conrelid = pg_index.indrelid
+            AND pg_constraint.conkey[1] = pg_index.indkey[0]) AS leads_with_foreign_key,
+    pg_index.indpred IS NOT NULL AS is_partial,
+    pg_index.indisvalid AS is_valid,
+    pg_get_indexdef(pg_index.indexrelid) AS definition,
+    pg_relation_size(pg_index.indexrelid) AS size,
+    pg_stat_user_indexes.idx_scan AS scans,
+    pg_stat_user_indexes.idx_tup_read AS tuples_read,
+    -- every insert and non-HOT update adds an entry to each index of the table
+    pg_stat_user_tables.n_tup_ins + pg_stat_user_tables.n_tup_upd - pg_stat_user_tables.n_tup_hot_upd AS table_writes
+FROM
+    pg_stat_user_indexes
+    JOIN pg_index ON pg_index.indexrelid = pg_stat_user_indexes.indexrelid
+    JOIN pg_stat_user_tables ON pg_stat_user_tables.relid = pg_stat_user_indexes.relid
+WHERE
+    pg_stat_user_indexes.relname LIKE %s
+ORDER BY
+    pg_stat_user_indexes.relname,
+    pg_stat_user_indexes.indexrelname;
@@ -9,4 +9,5 @@ WHERE
         FROM
             pg_index
         WHERE
-            indexrelid::regclass::text ILIKE '%%idx');
+            indexrelid::regclass::text ILIKE '%%idx'
+            AND indrelid::regclass::text ILIKE 'books\_%%');
@@ -13,8 +13,27 @@ from django.test.utils import CaptureQueriesContext
 
 
 REGEX_INSERT = re.compile(r"INSERT\s+INTO\s+(?P<table_name>.+?)(\s|$)", re.IGNORECASE)
-REGEX_FROM = re.compile(r"FROM\s+(?P<table_name>.+?)(\s|$)", re.IGNORECASE)
 REGEX_UPDATE = re.compile(r"UPDATE\s+(?P<table_name>.+?)(\s|$)", re.IGNORECASE)
+# only the tokens needed to find the main FROM clause, the other characters are
+# skipped by the leading character class, which is much faster than matching them
+REGEX_SQL_TOKEN = re.compile(
+    r"""
+    [^'"()fF]*
+    (?:
+        '(?:[^']|'')*'  # string literals and quoted identifiers may contain parenthesis
+        |"[^"]*"(?:\."[^"]*")*
+        |(?P<open>\()
+        |(?P<close>\))
+        |(?<![\w$"])(?P<from>[fF][rR][oO][mM])(?![\w$"])
+        |[fF]
+    )
+    """,
+    re.VERBOSE,
+)
+REGEX_FROM_TARGET = re.compile(
+    r'\s*(?:(?P<open>\()|"(?P<quoted>[^"]*)"|(?P<word>[\w$]+))'
+)
+REGEX_BLANK = re.compile(r"\s*")
 
 
 class SQLOperationTypes(str, Enum):
@@ -139,36 +158,86 @@ def get_model_name_from_table_name(table_name: str) -> str:
     return f"{model._meta.app_label}.{model.__name__}"
 
 
-def _remove_parenthesis_blocks(query: str) -> str:
+def _is_word_boundary(query: str, index: int) -> bool:
+    return not 0 <= index < len(query) or not (
+        query[index].isalnum() or query[index] in '_$"'
+    )
+
+
+def _get_main_table_name(query: str) -> str:
     """
-    Search for every block of parenthesis in the string and remove them. This is used
-    to remove sub-queries and then figure out which table the main query is referring to.
+    Return the table name following the FROM keyword of the main query.
+
+    The query is tokenized in a single pass: parenthesis blocks (sub-queries,
+    function calls, ...) are skipped, except when they directly follow the FROM
+    keyword (sub-query in the FROM clause) or start the query (compound queries
+    such as UNION, where the first member gives the model), in which case the
+    search continues inside the block.
     """
-    parenthesis_regex = re.compile(r"\([^(]*?\)")
-    while True:
-        updated_query = parenthesis_regex.sub("", query)
-        if updated_query == query:
-            break
-        query = updated_query
-    return query
+    # fast path: without string literals before it, the first FROM outside of
+    # parenthesis is the main one, unless the query starts with a parenthesis.
+    # str methods are used, regular expressions being slower on mid-sized queries
+    if not query.lstrip().startswith("("):
+        lowered = query.lower()
+        depth = position = quotes = 0
+        start = lowered.find("from")
+        while start != -1:
+            end = start + 4
+            if _is_word_boundary(query, start - 1) and _is_word_boundary(query, end):
+                if query.find("'", position, start) != -1:
+                    break
+                depth += query.count("(", position, start)
+                depth -= query.count(")", position, start)
+                quotes += query.count('"', position, start)
+                position = start
+                # an odd number of double quotes: within a quoted identifier
+                if depth == 0 and not quotes % 2:
+                    target = REGEX_FROM_TARGET.match(query, end)
+                    if target is None:
+                        return ""
+                    if not target.group("open"):
+                        return target.group("quoted") or target.group("word")
+                    break
+            start = lowered.find("from", end)
+
+    depth = main_depth = 0
+    # position of a parenthesis that would contain the main query
+    descend_position = REGEX_BLANK.match(query).end()
+    for token in REGEX_SQL_TOKEN.finditer(query):
+        kind = token.lastgroup
+        if kind == "open":
+            if depth == main_depth and token.start("open") == descend_position:
+                main_depth += 1
+                descend_position = REGEX_BLANK.match(query, token.end()).end()
+            depth += 1
+        elif kind == "close":
+            depth -= 1
+            if depth < main_depth:
+                # the main query ends without a FROM clause
+                return ""
+        elif kind == "from" and depth == main_depth:
+            target = REGEX_FROM_TARGET.match(query, token.end())
+            if target is None:
+                return ""
+            if target.group("open"):
+                descend_position = target.start("open")
+                continue
+            return target.group("quoted") or target.group("word")
+    return ""
 
 
 def _get_model_name_for_query_with_from_clause(query: str) -> str:
     """
     Return the model name associated with the table of a SELECT or DELETE query.
     """
-    query = _remove_parenthesis_blocks(query)
-    match = REGEX_FROM.search(query)
-    if not match:
-        return ""
-    return get_model_name_from_table_name(match.group("table_name").replace('"', ""))
+    return get_model_name_from_table_name(_get_main_table_name(query))
 
 
 def _get_model_name_for_insert_query(query: str) -> str:
     """
     Return the model name associated with the table of an INSERT query.
     """
-    match = re.match(REGEX_INSERT, query)
+    match = REGEX_INSERT.match(query)
     if not match:
         return ""
     return get_model_name_from_table_name(match.group("table_name").replace('"', ""))
@@ -202,16 +271,25 @@ SQL_OPERATIONS = {
 }
 
 
+# compound queries (UNION, ...) start with parenthesis
+REGEX_SQL_OPERATION = re.compile(
+    rf"[(\s]*(?P<operation>{'|'.join(map(re.escape, SQL_OPERATIONS))})"
+)
+
+
+@lru_cache(maxsize=4096)
 def parse_query(query: str) -> Tuple[str, str]:
     """
     Parse a SQL query and return its target (model name or savepoint identifier)
     and operation (INSERT, UPDATE, RELEASE SAVEPOINT, ...).
+
+    Results are cached, as the same queries are usually parsed many times.
     """
-    for operation in SQL_OPERATIONS:
-        if not query.startswith(operation):
-            continue
-        return SQL_OPERATIONS[operation](query), operation
-    raise NotImplementedError(f"Unsupported SQL operation: {query}")
+    match = REGEX_SQL_OPERATION.match(query)
+    if not match:
+        raise NotImplementedError(f"Unsupported SQL operation: {query}")
+    operation = SQLOperationTypes(match.group("operation"))
+    return SQL_OPERATIONS[operation](query), operation
 
 
 def check_unordered_queries(
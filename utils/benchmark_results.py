@@ -0,0 +1,304 @@
+import json
+import math
+import statistics
+import subprocess
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import cache
+from hashlib import sha1
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from rich.table import Table
+
+
+RESULTS_DIR = settings.BASE_DIR / "benchmark_results"
+
+
+def get_git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _round_significant(value: int, digits: int = 2) -> int:
+    if value <= 0:
+        return value
+    return round(value, digits - 1 - int(math.floor(math.log10(value))))
+
+
+def get_dataset_shape(app_label: str = "books") -> dict[str, int]:
+    """
+    Return the approximate row count of each table of the app, from the planner
+    statistics as counting millions of rows is slow. Counts are rounded to 2
+    significant digits, so that the shape is stable for the same generated dataset.
+    """
+    models = list(apps.get_app_config(app_label).get_models())
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(%s)",
+            [tables],
+        )
+        estimates = dict(cursor.fetchall())
+
+    shape = {}
+    for model, table in zip(models, tables):
+        count = estimates.get(table, -1)
+        if count < 0:  # never analyzed
+            count = model.objects.count()
+        shape[table] = _round_significant(count)
+    return shape
+
+
+def dataset_key(shape: dict[str, int]) -> str:
+    return sha1(json.dumps(shape, sort_keys=True).encode()).hexdigest()[:8]
+
+
+def save_results(results: list[dict], results_dir: Path = RESULTS_DIR) -> Path:
+    """
+    Store benchmark results as JSON, keyed by git commit and dataset shape.
+    Each result is a dict with url_name, library_id, query_params and durations.
+    """
+    commit = get_git_commit()
+    shape = get_dataset_shape()
+    created_at = datetime.now(timezone.utc)
+    path = results_dir / f"{commit}_{dataset_key(shape)}_{created_at:%Y%m%d%H%M%S}.json"
+    results_dir.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps(
+            {
+                "commit": commit,
+                "dataset": shape,
+                "created_at": created_at,
+                "results": results,
+            },
+            cls=DjangoJSONEncoder,
+            indent=2,
+        )
+    )
+    return path
+
+
+def load_results(reference: str, results_dir: Path = RESULTS_DIR) -> dict:
+    """
+    Load stored results, from a file path or a git commit. For a commit, the
+    latest results with the current dataset shape are used.
+    Plain JSON outputs (a list of results) are supported as well.
+    """
+    path = Path(reference)
+    if not path.is_file():
+        pattern = f"{reference}*_{dataset_key(get_dataset_shape())}_*.json"
+        candidates = sorted(results_dir.glob(pattern))
+        if not candidates:
+            raise FileNotFoundError(
+                f"No results for commit {reference} with the current dataset"
+            )
+        path = candidates[-1]
+    content = json.loads(path.read_text())
+    if isinstance(content, list):
+        return {"commit": path.name, "dataset": None, "results": content}
+    return content
+
+
+def result_key(result: dict) -> tuple:
+    return (
+        result["url_name"],
+        result["library_id"],
+        json.dumps(result["query_params"], sort_keys=True, cls=DjangoJSONEncoder),
+        # load tests results are not comparable to sequential ones
+        result.get("concurrency"),
+        result.get("cache_mode"),
+        result.get("index_configuration"),
+        result.get("connection_configuration"),
+    )
+
+
+def percentile(values: list[float], percent: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+# up to this size of samples, the p-value is computed from the exact distribution of U
+EXACT_MAX_SAMPLE_SIZE = 20
+
+
+@cache
+def _u_distribution(n_a: int, n_b: int) -> tuple[int, ...]:
+    """
+    Count of the orderings of n_a + n_b distinct values giving each U,
+    with U(n_a, n_b) = U(n_a - 1, n_b) + n_b or U(n_a, n_b - 1),
+    depending on the sample of the largest value.
+    """
+    if n_a == 0 or n_b == 0:
+        return (1,)
+    counts = [0] * (n_a * n_b + 1)
+    for u, count in enumerate(_u_distribution(n_a - 1, n_b)):
+        counts[u + n_b] += count
+    for u, count in enumerate(_u_distribution(n_a, n_b - 1)):
+        counts[u] += count
+    return tuple(counts)
+
+
+def min_p_value(n_a: int, n_b: int) -> float:
+    """The lowest p-value the test can give for these sizes of samples."""
+    return min(1.0, 2 / math.comb(n_a + n_b, n_a))
+
+
+def mann_whitney_p_value(sample_a: list[float], sample_b: list[float]) -> float:
+    """
+    Two-sided p-value of the Mann-Whitney U test, exact for small samples and
+    with the normal approximation otherwise.
+    It doesn't assume durations are normally distributed, but it needs a few
+    runs (--number 5 at least) to report any significant change, see min_p_value.
+    """
+    n_a, n_b = len(sample_a), len(sample_b)
+    ranked = sorted(
+        [(value, 0) for value in sample_a] + [(value, 1) for value in sample_b]
+    )
+    ranks = [0.0] * len(ranked)
+    index = 0
+    while index < len(ranked):
+        end = index
+        while end + 1 < len(ranked) and ranked[end + 1][0] == ranked[index][0]:
+            end += 1
+        for tied in range(index, end + 1):
+            ranks[tied] = (index + end) / 2 + 1
+        index = end + 1
+
+    rank_sum_a = sum(rank for rank, (_, group) in zip(ranks, ranked) if group == 0)
+    u = rank_sum_a - n_a * (n_a + 1) / 2
+
+    if max(n_a, n_b) <= EXACT_MAX_SAMPLE_SIZE:
+        # ties give a half-integer U: it is rounded toward the mean, so that the
+        # p-value is conservative, e.g. P(U <= 2) for U = 1.5 in the lower tail
+        counts = _u_distribution(n_a, n_b)
+        total = sum(counts)
+        lower = sum(counts[: math.ceil(u) + 1]) / total
+        upper = sum(counts[math.floor(u) :]) / total
+        return min(1.0, 2 * min(lower, upper))
+
+    mean = n_a * n_b / 2
+    std = math.sqrt(n_a * n_b * (n_a + n_b + 1) / 12)
+    if std == 0:
+        return 1.0
+    z = (abs(u - mean) - 0.5) / std  # continuity correction
+    return min(1.0, 2 * (1 - statistics.NormalDist().cdf(z)))
+
+
+@dataclass
+class Comparison:
+    key: tuple
+    baseline_p50: float
+    current_p50: float
+    baseline_p95: float
+    current_p95: float
+    p_value: float
+    baseline_runs: int
+    current_runs: int
+
+    @property
+    def p50_delta(self) -> float:
+        """relative change of the median"""
+        return (self.current_p50 - self.baseline_p50) / self.baseline_p50
+
+    @property
+    def p95_delta(self) -> float:
+        return (self.current_p95 - self.baseline_p95) / self.baseline_p95
+
+    def is_significant(self, alpha: float = 0.05) -> bool:
+        return self.p_value < alpha
+
+    def can_be_significant(self, alpha: float = 0.05) -> bool:
+        return min_p_value(self.baseline_runs, self.current_runs) < alpha
+
+
+def compare_results(baseline: list[dict], current: list[dict]) -> list[Comparison]:
+    """
+    Compare the durations of the endpoints benchmarked in both results.
+    """
+    baseline_by_key = {result_key(result): result for result in baseline}
+    comparisons = []
+    for result in current:
+        key = result_key(result)
+        if key not in baseline_by_key:
+            continue
+        baseline_durations = baseline_by_key[key]["durations"]
+        durations = result["durations"]
+        if not baseline_durations or not durations:
+            # e.g. hypothetical index configurations, which are not timed
+            continue
+        comparisons.append(
+            Comparison(
+                key=key,
+                baseline_p50=statistics.median(baseline_durations),
+                current_p50=statistics.median(durations),
+                baseline_p95=percentile(baseline_durations, 95),
+                current_p95=percentile(durations, 95),
+                p_value=mann_whitney_p_value(baseline_durations, durations),
+                baseline_runs=len(baseline_durations),
+                current_runs=len(durations),
+            )
+        )
+    return comparisons
+
+
+def format_delta(delta: float) -> str:
+    color = "green" if delta < 0 else "red"
+    return f"[{color}]{delta:+.1%}[/{color}]"
+
+
+def comparison_table(comparisons: list[Comparison], alpha: float = 0.05) -> Table:
+    table = Table(title="Comparison with baseline", show_lines=True)
+    table.add_column("Endpoint")
+    table.add_column("Library")
+    table.add_column("Query params")
+    table.add_column("p50")
+    table.add_column("p95")
+    table.add_column("Significant")
+    for comparison in comparisons:
+        (
+            url_name,
+            library_id,
+            query_params,
+            concurrency,
+            cache_mode,
+            index_configuration,
+            connection_configuration,
+        ) = comparison.key
+        if concurrency is not None:
+            url_name += f" (x{concurrency})"
+        if cache_mode is not None:
+            url_name += f" ({cache_mode} cache)"
+        if index_configuration is not None:
+            url_name += f" ({index_configuration})"
+        if connection_configuration is not None:
+            url_name += f" ({connection_configuration})"
+        table.add_row(
+            url_name,
+            str(library_id),
+            query_params,
+            f"{comparison.current_p50:.3f} s ({format_delta(comparison.p50_delta)})",
+            f"{comparison.current_p95:.3f} s ({format_delta(comparison.p95_delta)})",
+            f"yes (p={comparison.p_value:.3f})"
+            if comparison.is_significant(alpha)
+            else f"no (p={comparison.p_value:.3f})"
+            if comparison.can_be_significant(alpha)
+            else "[yellow]too few runs[/yellow]",
+        )
+    if not all(comparison.can_be_significant(alpha) for comparison in comparisons):
+        table.caption = (
+            f"[yellow]Some comparisons have too few runs to ever reach p < {alpha}, "
+            "use --number 5 or more, for the baseline too[/yellow]"
+        )
+    return table
@@ -0,0 +1,605 @@
+import json
+import statistics
+import sys
+import timeit
+from base64 import b64encode
+from contextlib import contextmanager
+from datetime import date
+from functools import cache
+from typing import TYPE_CHECKING
+from urllib.parse import urlencode
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Count
+from django.db.utils import load_backend
+from django.urls import reverse
+from rich.console import Console
+from rich.table import Table
+
+from books.models import Book, Library
+from utils.benchmark_results import (
+    compare_results,
+    comparison_table,
+    format_delta,
+    load_results,
+    save_results,
+)
+from utils.explain import PlanSummary, explain, explain_analyze, get_main_query
+from utils.index_experiment import IndexConfiguration, index_configuration
+from utils.query_capture import QueryRecorder, capture_queries
+from utils.sql import prewarm_tables, reconnect
+
+
+if TYPE_CHECKING:
+    from rest_framework.test import APIClient
+
+
+@cache
+def get_client() -> "APIClient":
+    # imported when needed, django.test is slow to import and load tests don't use it
+    from rest_framework.test import APIClient
+
+    return APIClient()
+
+
+filters = [
+    {},
+    {"written_at__gte": date(2022, 1, 1)},
+    {"rating__gte": 6},
+    {"written_at__gte": date(2022, 1, 1), "rating__gte": 6},
+]
+
+orderings = [
+    "id",
+    "written_at",
+    "rating",
+    "-id",
+    "-written_at",
+    "-rating",
+    "-written_at,rating",
+]
+
+
+book_filters = [
+    {},
+    {"release_date__gte": date(2000, 1, 1)},
+    {"author__name__iexact": "tolstoy"},
+    {"author__name__icontains": "tolst"},
+    {"title__icontains": "war"},
+    {"release_date__gte": date(2000, 1, 1), "ordering": "-release_date"},
+    # each tag is on about half of the books of the default dataset: from
+    # non-selective to selective tag filters
+    {"tags": "audio"},
+    {"tags__all": "audio,braille"},
+    {"tags__all": "comics,braille,audio,movie"},
+    {"tags__all": "comics,braille,audio,movie,french,german"},
+]
+
+
+def keyset_cursor(position: int) -> str:
+    """Cursor of a KeysetPagination page starting after the `position` id."""
+    return b64encode(urlencode({"p": position}).encode()).decode()
+
+
+# deep pages of the author stats, for the default dataset of 10k persons
+author_stats_params = [
+    {**cursor, **engine}
+    for cursor in ({}, {"cursor": keyset_cursor(5_000)})
+    for engine in ({}, {"engine": "aggregate"}, {"engine": "subquery"})
+]
+
+
+# query params to benchmark for each url name, [{}] by default
+data_by_url = {
+    "list-reader-per-book": [{}],
+    "list-books-aggregate": book_filters,
+    "list-author-stats": author_stats_params,
+    "simple-list-reviews": [{}],
+    "filtered-list-reviews": filters,
+    "ordered-list-reviews": [{"ordering": ordering} for ordering in orderings],
+    "complete-list-reviews": [
+        {**filter_, "ordering": ordering}
+        for filter_ in filters
+        for ordering in orderings
+    ],
+}
+
+
+LIBRARY_SIZES = ("small", "medium", "large")
+CACHE_MODES = ("warm", "cold")
+
+
+def get_url_names():
+    """Return the name of every route of the books app."""
+    # the views are only imported when needed
+    from books.urls import urlpatterns
+
+    return [pattern.name for pattern in urlpatterns]
+
+
+def pick_libraries_by_size(sizes=LIBRARY_SIZES):
+    """
+    Return {size: library_id}, picking the libraries with the fewest books,
+    the median count of books, and the most books.
+    """
+    library_ids = list(
+        Book.objects.values("library_id")
+        .annotate(book_count=Count("id"))
+        .order_by("book_count", "library_id")
+        .values_list("library_id", flat=True)
+    )
+    if not library_ids:
+        raise ValueError("No library with books, generate data first")
+    candidates = {
+        "small": library_ids[0],
+        "medium": library_ids[len(library_ids) // 2],
+        "large": library_ids[-1],
+    }
+    picked = {}
+    for size in sizes:
+        # with few libraries, several sizes may be the same library
+        if candidates[size] not in picked.values():
+            picked[size] = candidates[size]
+    return picked
+
+
+def setup_table(has_multiple_runs, explain=False, matrix=False):
+    table = Table(show_lines=True)
+    if matrix:
+        table.add_column("Endpoint")
+        table.add_column("Cache")
+    table.add_column("Query params")
+    table.add_column("Library")
+    if has_multiple_runs:
+        table.add_column("Mean duration")
+        table.add_column("Max duration")
+        table.add_column("Runs")
+    else:
+        table.add_column("duration")
+    if explain:
+        table.add_column("Main query plan")
+    return table
+
+
+def format_query_params(data):
+    return "\n".join(map(lambda item: f"{item[0]}={item[1]}", data.items()))
+
+
+def get_color(value: float) -> str:
+    if value < 1:
+        color = "green"
+    elif value < 3:
+        color = "yellow"
+    elif value < 7:
+        color = "orange_red1"
+    else:
+        color = "bright_red"
+
+    return f"[bold {color}] {value:.3f}"
+
+
+def add_row(table, url, data, library, results, repeat, plan_summary=None, prefix=()):
+    mean = get_color(statistics.mean(results))
+
+    if repeat > 1:
+        row = [
+            *prefix,
+            format_query_params(data),
+            str(library),
+            f"{mean} s",
+            f"{get_color(max(results))} s",
+            str(repeat),
+        ]
+    else:
+        row = [*prefix, format_query_params(data), str(library), f"{mean} s"]
+    if plan_summary is not None:
+        row.append(str(plan_summary))
+    table.add_row(*row)
+
+
+def explain_main_query(url, data, analyze=True):
+    """
+    Return the EXPLAIN ANALYZE plan of the slowest SELECT query of the request,
+    or its estimated plan without `analyze`.
+    """
+    with capture_queries() as recorder:
+        get_client().get(url, data or {})
+    main_query = get_main_query(recorder.queries)
+    if main_query is None:
+        return None
+    if not analyze:
+        return explain(main_query.sql, main_query.params)
+    return explain_analyze(main_query.sql, main_query.params)
+
+
+def run_case(
+    url_name,
+    data,
+    library_id,
+    repeat,
+    warmup=0,
+    cache_mode=None,
+    explain=False,
+    close_connection=False,
+):
+    """
+    Benchmark one url with the given query params and return its results.
+
+    In "warm" mode, the request is first sent `warmup` times,
+    in "cold" mode each run uses a new database connection.
+    With `close_connection`, the connection is closed before each run, so that
+    opening it (or taking it from a pool) is measured, as with CONN_MAX_AGE = 0.
+    """
+    url = reverse(url_name, args=[library_id])
+
+    def request():
+        return get_client().get(url, data or {})
+
+    if cache_mode != "cold":
+        for _ in range(warmup):
+            request()
+    if cache_mode == "cold":
+        setup = reconnect
+    elif close_connection:
+        setup = connection.close
+    else:
+        setup = "pass"
+    results = timeit.repeat(request, setup=setup, number=1, repeat=repeat)
+    plan = explain_main_query(url, data) if explain else None
+    return {
+        "url_name": url_name,
+        "library_id": library_id,
+        "query_params": data,
+        "cache_mode": cache_mode,
+        "durations": results,
+        "plan": plan,
+    }
+
+
+def capture_workload(url_names=None, library_ids=None):
+    """
+    Send one request for each route (or `url_names`) and query params of
+    data_by_url, on small, medium and large libraries (or `library_ids`),
+    and return the captured queries.
+    """
+    url_names = url_names or get_url_names()
+    library_ids = library_ids or pick_libraries_by_size().values()
+    with capture_queries(QueryRecorder(max_queries=None)) as recorder:
+        for url_name in url_names:
+            for data in data_by_url.get(url_name, [{}]):
+                for library_id in library_ids:
+                    get_client().get(reverse(url_name, args=[library_id]), data or {})
+    return list(recorder.queries)
+
+
+def output_results(
+    console, benchmark_results, save=False, compare_to=None, json_path=None
+):
+    """
+    Write the results as JSON to `json_path` ("-" for stdout), store them with
+    `save`, and compare them to the `compare_to` baseline (a git commit or a JSON
+    file), see utils/benchmark_results.py.
+    """
+    if json_path == "-":
+        json.dump(benchmark_results, sys.stdout, cls=DjangoJSONEncoder, indent=2)
+    elif json_path:
+        with open(json_path, "w") as json_file:
+            json.dump(benchmark_results, json_file, cls=DjangoJSONEncoder, indent=2)
+
+    if save:
+        console.print(f"Results stored in {save_results(benchmark_results)}")
+
+    if compare_to:
+        baseline = load_results(compare_to)
+        comparisons = compare_results(baseline["results"], benchmark_results)
+        console.print(f"Baseline: commit {baseline['commit']}")
+        console.print(comparison_table(comparisons))
+
+
+def benchmark_list_reviews(
+    url_names, library_ids, repeat=1, explain=False, save=False, compare_to=None
+):
+    """
+    Benchmark the given endpoints, with every query params in data_by_url.
+    With `explain`, the plan of the main query of each request is captured,
+    and summarized in the table.
+    With `save`, results are stored (see utils/benchmark_results.py), and with
+    `compare_to` (a git commit or a JSON file) they are compared to a baseline.
+
+    Return the results, with the plans when captured.
+    """
+    table = setup_table(has_multiple_runs=repeat > 1, explain=explain)
+    benchmark_results = []
+
+    libraries = dict(
+        Library.objects.filter(id__in=library_ids).values_list("id", "name")
+    )
+    for url_name in url_names:
+        for data in data_by_url[url_name]:
+            for library_id in library_ids:
+                result = run_case(url_name, data, library_id, repeat, explain=explain)
+                plan = result["plan"]
+                add_row(
+                    table,
+                    reverse(url_name, args=[library_id]),
+                    data,
+                    libraries.get(library_id),
+                    result["durations"],
+                    repeat,
+                    PlanSummary.from_plan(plan) if plan else None,
+                )
+                benchmark_results.append(result)
+
+    console = Console()
+    console.print(table)
+    output_results(console, benchmark_results, save, compare_to)
+    return benchmark_results
+
+
+def benchmark_matrix(
+    url_names=None,
+    sizes=LIBRARY_SIZES,
+    library_ids=None,
+    repeat=3,
+    warmup=1,
+    cache_modes=("warm",),
+    explain=False,
+    save=False,
+    compare_to=None,
+    console=None,
+):
+    """
+    Benchmark every route of the books app (or `url_names`), with the query params
+    of data_by_url, on small, medium and large libraries (or `library_ids`),
+    for each cache mode ("warm" and/or "cold", see run_case).
+
+    Return the results, see benchmark_list_reviews for the other options.
+    """
+    url_names = url_names or get_url_names()
+    if library_ids:
+        libraries_by_label = {str(library_id): library_id for library_id in library_ids}
+    else:
+        libraries_by_label = pick_libraries_by_size(sizes)
+    names = dict(
+        Library.objects.filter(id__in=libraries_by_label.values()).values_list(
+            "id", "name"
+        )
+    )
+    if "warm" in cache_modes:
+        # it does nothing if pg_prewarm is not available, warmup runs still apply
+        prewarm_tables(Book._meta.app_label + "_")
+
+    table = setup_table(has_multiple_runs=repeat > 1, explain=explain, matrix=True)
+    benchmark_results = []
+    for url_name in url_names:
+        for data in data_by_url.get(url_name, [{}]):
+            for label, library_id in libraries_by_label.items():
+                for cache_mode in cache_modes:
+                    result = run_case(
+                        url_name, data, library_id, repeat, warmup, cache_mode, explain
+                    )
+                    result["library_size"] = label
+                    plan = result["plan"]
+                    add_row(
+                        table,
+                        reverse(url_name, args=[library_id]),
+                        data,
+                        f"{label}: {names.get(library_id)}",
+                        result["durations"],
+                        repeat,
+                        PlanSummary.from_plan(plan) if plan else None,
+                        prefix=(url_name, cache_mode),
+                    )
+                    benchmark_results.append(result)
+
+    console = console or Console()
+    console.print(table)
+    output_results(console, benchmark_results, save, compare_to)
+    return benchmark_results
+
+
+def configuration_table(results_by_configuration, title="Index experiment"):
+    configuration_names = list(results_by_configuration)
+    baseline_results = results_by_configuration[configuration_names[0]]
+
+    table = Table(title=title, show_lines=True)
+    table.add_column("Endpoint")
+    table.add_column("Query params")
+    table.add_column("Library")
+    for name in configuration_names:
+        table.add_column(name)
+
+    for index, baseline in enumerate(baseline_results):
+        baseline_median = statistics.median(baseline["durations"])
+        baseline_plan = baseline["plan"] and PlanSummary.from_plan(baseline["plan"])
+        cells = []
+        for name in configuration_names:
+            result = results_by_configuration[name][index]
+            plan = result["plan"] and PlanSummary.from_plan(result["plan"])
+            if result.get("hypothetical"):
+                cell = "hypothetical, estimated plan only"
+            else:
+                median = statistics.median(result["durations"])
+                cell = f"{median:.3f} s"
+                if result is not baseline:
+                    cell += f" ({format_delta((median - baseline_median) / baseline_median)})"
+            if plan is not None and result is not baseline:
+                same_plan = (
+                    baseline_plan is not None
+                    and plan.node_types == baseline_plan.node_types
+                )
+                cell += "\nsame plan" if same_plan else f"\n{plan}"
+            elif plan is not None:
+                cell += f"\n{plan}"
+            cells.append(cell)
+        table.add_row(
+            baseline["url_name"],
+            format_query_params(baseline["query_params"]),
+            str(baseline["library_id"]),
+            *cells,
+        )
+    return table
+
+
+def benchmark_index_configurations(
+    configurations,
+    url_names=None,
+    sizes=LIBRARY_SIZES,
+    library_ids=None,
+    repeat=3,
+    warmup=1,
+    console=None,
+):
+    """
+    Benchmark the routes (see benchmark_matrix) under the current indexes,
+    then under each IndexConfiguration, and report latency and plan changes.
+    Each configuration is applied in a transaction which is rolled back,
+    see utils/index_experiment.py.
+
+    With hypothetical indexes, only the estimated plans are compared, and the
+    results have no durations. Return {configuration name: results}.
+    """
+    url_names = url_names or get_url_names()
+    library_ids = library_ids or list(pick_libraries_by_size(sizes).values())
+    configurations = [IndexConfiguration(name="current indexes"), *configurations]
+
+    results_by_configuration = {}
+    for configuration in configurations:
+        hypothetical = bool(configuration.hypothetical)
+        results = []
+        with index_configuration(configuration):
+            for url_name in url_names:
+                for data in data_by_url.get(url_name, [{}]):
+                    for library_id in library_ids:
+                        if hypothetical:
+                            # hypothetical indexes are ignored by real executions
+                            url = reverse(url_name, args=[library_id])
+                            result = {
+                                "url_name": url_name,
+                                "library_id": library_id,
+                                "query_params": data,
+                                "cache_mode": None,
+                                "durations": [],
+                                "plan": explain_main_query(url, data, analyze=False),
+                            }
+                        else:
+                            result = run_case(
+                                url_name, data, library_id, repeat, warmup, explain=True
+                            )
+                        result["index_configuration"] = configuration.name
+                        result["hypothetical"] = hypothetical
+                        results.append(result)
+        results_by_configuration[configuration.name] = results
+
+    console = console or Console()
+    console.print(configuration_table(results_by_configuration))
+    return results_by_configuration
+
+
+# settings of the default database to benchmark, CONN_MAX_AGE = 0 closes the
+# connection before each run, see playground/postgresql_pool/base.py
+CONNECTION_CONFIGURATIONS = {
+    "persistent": {"CONN_MAX_AGE": None},
+    "per request": {"CONN_MAX_AGE": 0},
+    "pool": {
+        "ENGINE": "playground.postgresql_pool",
+        "CONN_MAX_AGE": 0,
+        "OPTIONS": {"pool": {"min_size": 1, "max_size": 1}},
+    },
+    # prepared from their second execution, i.e. after the warmup
+    "persistent, prepared": {
+        "CONN_MAX_AGE": None,
+        "OPTIONS": {"server_side_binding": True, "prepare_threshold": 1},
+    },
+    "pool, prepared": {
+        "ENGINE": "playground.postgresql_pool",
+        "CONN_MAX_AGE": 0,
+        "OPTIONS": {
+            "pool": {"min_size": 1, "max_size": 1},
+            "server_side_binding": True,
+            "prepare_threshold": 1,
+        },
+    },
+}
+REVIEW_URL_NAMES = [
+    "simple-list-reviews",
+    "filtered-list-reviews",
+    "ordered-list-reviews",
+    "complete-list-reviews",
+]
+
+
+@contextmanager
+def database_configuration(overrides):
+    """
+    Replace the default database connection by one with the settings overrides,
+    on top of the current settings without pool nor prepared statements.
+    """
+    previous = connections[DEFAULT_DB_ALIAS]
+    options = {
+        key: value
+        for key, value in previous.settings_dict["OPTIONS"].items()
+        if key not in ("pool", "server_side_binding", "prepare_threshold")
+    }
+    settings_dict = {
+        **previous.settings_dict,
+        "ENGINE": "django.db.backends.postgresql",
+        **overrides,
+        "OPTIONS": {**options, **overrides.get("OPTIONS", {})},
+    }
+    wrapper = load_backend(settings_dict["ENGINE"]).DatabaseWrapper(
+        settings_dict, DEFAULT_DB_ALIAS
+    )
+    previous.close()
+    connections[DEFAULT_DB_ALIAS] = wrapper
+    try:
+        yield wrapper
+    finally:
+        wrapper.close()
+        if hasattr(wrapper, "close_pool"):
+            wrapper.close_pool()
+        connections[DEFAULT_DB_ALIAS] = previous
+
+
+def benchmark_connection_configurations(
+    configurations=CONNECTION_CONFIGURATIONS,
+    url_names=REVIEW_URL_NAMES,
+    sizes=LIBRARY_SIZES,
+    library_ids=None,
+    repeat=5,
+    warmup=1,
+    console=None,
+):
+    """
+    Benchmark the routes (the review endpoints by default, with the query params
+    of data_by_url) under each database configuration: persistent connections,
+    a connection per request, a pool, and prepared statements.
+    Return {configuration name: results}.
+    """
+    library_ids = library_ids or list(pick_libraries_by_size(sizes).values())
+    results_by_configuration = {}
+    for name, overrides in configurations.items():
+        results = []
+        with database_configuration(overrides) as wrapper:
+            close_connection = wrapper.settings_dict["CONN_MAX_AGE"] == 0
+            for url_name in url_names:
+                for data in data_by_url.get(url_name, [{}]):
+                    for library_id in library_ids:
+                        result = run_case(
+                            url_name,
+                            data,
+                            library_id,
+                            repeat,
+                            warmup,
+                            close_connection=close_connection,
+                        )
+                        result["connection_configuration"] = name
+                        results.append(result)
+        results_by_configuration[name] = results
+
+    console = console or Console()
+    console.print(
+        configuration_table(results_by_configuration, title="Database connections")
+    )
+    return results_by_configuration
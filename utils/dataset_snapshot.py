@@ -0,0 +1,207 @@
+import json
+import zipfile
+from hashlib import sha1
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.migrations.loader import MigrationLoader
+
+
+SNAPSHOT_APP = "books"
+MANIFEST_NAME = "manifest.json"
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _get_migrations() -> list[str]:
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    return sorted(
+        f"{app_label}.{name}" for app_label, name in loader.graph.leaf_nodes()
+    )
+
+
+def get_snapshot_key(generation_options: dict) -> str:
+    """
+    Key of the dataset generated with these options. It includes the last
+    migrations, as snapshots can only be restored in the same schema.
+    """
+    payload = json.dumps(
+        {"options": generation_options, "migrations": _get_migrations()},
+        sort_keys=True,
+    )
+    return sha1(payload.encode()).hexdigest()[:16]
+
+
+def _get_models() -> list:
+    # including the auto-created many-to-many tables
+    return [
+        model
+        for model in apps.get_app_config(SNAPSHOT_APP).get_models(
+            include_auto_created=True
+        )
+        if model._meta.managed and not model._meta.proxy
+    ]
+
+
+def get_archive_path(key: str) -> Path:
+    return Path(settings.DATASET_SNAPSHOT_DIR) / f"{key}.zip"
+
+
+def dump_archive(path: Path) -> None:
+    """
+    Dump the tables of the app in a zip archive, one compressed binary COPY per
+    table, with a manifest of the migrations to check on restore.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tables = [model._meta.db_table for model in _get_models()]
+    tmp_path = path.with_suffix(".tmp")
+    # a single transaction, for a consistent snapshot of all the tables
+    with transaction.atomic(), connection.cursor() as cursor, zipfile.ZipFile(
+        tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1
+    ) as archive:
+        archive.writestr(
+            MANIFEST_NAME,
+            json.dumps({"migrations": _get_migrations(), "tables": tables}),
+        )
+        for table in tables:
+            with archive.open(f"{table}.copy", "w") as member, cursor.copy(
+                f"COPY {connection.ops.quote_name(table)} TO STDOUT (FORMAT binary)"
+            ) as copy:
+                for data in copy:
+                    member.write(data)
+    # an interrupted dump doesn't leave a truncated archive
+    tmp_path.replace(path)
+
+
+def restore_archive(path: Path) -> None:
+    """
+    Replace the rows of the app tables by those of the archive, and reset their
+    sequences. Foreign keys are deferred, so tables can be loaded in any order.
+    """
+    models = _get_models()
+    tables = [model._meta.db_table for model in models]
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+        if manifest["migrations"] != _get_migrations():
+            raise SnapshotError(
+                f"{path} was dumped with other migrations: {manifest['migrations']}"
+            )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "TRUNCATE {} CASCADE".format(
+                    ", ".join(map(connection.ops.quote_name, tables))
+                )
+            )
+            # like pg_restore, indexes and foreign keys are created after the rows,
+            # in bulk: 4x faster than maintaining them row by row
+            deferred = _drop_indexes_and_foreign_keys(cursor, tables)
+            # the denormalized columns maintained by triggers, like Book.tag_mask,
+            # are in the archive already
+            _set_user_triggers(cursor, tables, enabled=False)
+            for table in manifest["tables"]:
+                with archive.open(f"{table}.copy") as member, cursor.copy(
+                    f"COPY {connection.ops.quote_name(table)} FROM STDIN (FORMAT binary)"
+                ) as copy:
+                    while data := member.read(1 << 20):
+                        copy.write(data)
+            _set_user_triggers(cursor, tables, enabled=True)
+            cursor.execute("SET LOCAL maintenance_work_mem = '256MB'")
+            for sql in deferred:
+                cursor.execute(sql)
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+    _analyze(tables)
+
+
+def _drop_indexes_and_foreign_keys(cursor, tables: list[str]) -> list[str]:
+    """
+    Drop the foreign keys and the indexes not backing a constraint of the tables,
+    return the statements creating them back.
+    """
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid) "
+        "FROM pg_constraint WHERE contype = 'f' AND conrelid::regclass::text = ANY(%s)",
+        [tables],
+    )
+    foreign_keys = cursor.fetchall()
+    cursor.execute(
+        "SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) FROM pg_index "
+        "WHERE indrelid::regclass::text = ANY(%s) AND NOT EXISTS("
+        "SELECT 1 FROM pg_constraint WHERE conindid = indexrelid)",
+        [tables],
+    )
+    indexes = cursor.fetchall()
+    quote_name = connection.ops.quote_name
+    for table, constraint, _ in foreign_keys:
+        cursor.execute(
+            f"ALTER TABLE {quote_name(table)} DROP CONSTRAINT {quote_name(constraint)}"
+        )
+    for index, _ in indexes:
+        cursor.execute(f"DROP INDEX {quote_name(index)}")
+    return [definition for _, definition in indexes] + [
+        f"ALTER TABLE {quote_name(table)} ADD CONSTRAINT {quote_name(constraint)} "
+        f"{definition}"
+        for table, constraint, definition in foreign_keys
+    ]
+
+
+def _set_user_triggers(cursor, tables: list[str], enabled: bool) -> None:
+    action = "ENABLE" if enabled else "DISABLE"
+    for table in tables:
+        cursor.execute(
+            f"ALTER TABLE {connection.ops.quote_name(table)} {action} TRIGGER USER"
+        )
+
+
+def _analyze(tables: list[str]) -> None:
+    # the autovacuum would only do it later, and plans depend on the statistics
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "ANALYZE {}".format(", ".join(map(connection.ops.quote_name, tables)))
+        )
+
+
+def get_template_name(key: str) -> str:
+    return f"snapshot_{key}"
+
+
+def template_exists(key: str) -> bool:
+    with connection._nodb_cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS(SELECT 1 FROM pg_database WHERE datname = %s)",
+            [get_template_name(key)],
+        )
+        (exists,) = cursor.fetchone()
+    return exists
+
+
+def create_template(key: str) -> None:
+    """
+    Copy the current database in a template database on the server, which is
+    faster to restore than an archive, as files are copied without parsing rows.
+    There must be no other connection to the current database.
+    """
+    name = connection.ops.quote_name(connection.settings_dict["NAME"])
+    connection.close()
+    with connection._nodb_cursor() as cursor:
+        cursor.execute(
+            f"CREATE DATABASE {connection.ops.quote_name(get_template_name(key))} "
+            f"TEMPLATE {name}"
+        )
+
+
+def restore_template(key: str) -> None:
+    """Recreate the current database from a template, other sessions are closed."""
+    name = connection.ops.quote_name(connection.settings_dict["NAME"])
+    connection.close()
+    with connection._nodb_cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+        cursor.execute(
+            f"CREATE DATABASE {name} "
+            f"TEMPLATE {connection.ops.quote_name(get_template_name(key))}"
+        )
@@ -0,0 +1,102 @@
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from utils.assert_queries import SQLOperationTypes, parse_query
+from utils.query_capture import CapturedQuery
+
+
+def explain_analyze(sql: str, params: Any = None, using: str = DEFAULT_DB_ALIAS):
+    """
+    Run the query with EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) and return its plan.
+    The query is actually executed.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+        (result,) = cursor.fetchone()
+    # psycopg2 decodes json, but other drivers may not
+    return result[0] if isinstance(result, list) else result
+
+
+def explain(
+    sql: str, params: Any = None, generic_plan=False, using: str = DEFAULT_DB_ALIAS
+):
+    """
+    Return the estimated plan of the query, without executing it.
+    With `generic_plan` (PostgreSQL 16+), queries with $1 placeholders,
+    as stored by pg_stat_statements, can be explained without their parameters.
+    """
+    options = "FORMAT JSON, GENERIC_PLAN" if generic_plan else "FORMAT JSON"
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"EXPLAIN ({options}) {sql}", params)
+        (result,) = cursor.fetchone()
+    return result[0] if isinstance(result, list) else result
+
+
+def iter_plan_nodes(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+
+def get_index_names(plan: dict) -> set[str]:
+    """Return the names of the indexes scanned by the plan."""
+    return {
+        node["Index Name"]
+        for node in iter_plan_nodes(plan["Plan"])
+        if "Index Name" in node
+    }
+
+
+@dataclass
+class PlanSummary:
+    execution_time: float  # ms
+    node_types: Counter = field(default_factory=Counter)
+    sort_methods: set[str] = field(default_factory=set)
+    rows_removed_by_filter: int = 0
+    shared_read_blocks: int = 0
+
+    @classmethod
+    def from_plan(cls, plan: dict) -> "PlanSummary":
+        summary = cls(execution_time=plan.get("Execution Time", 0.0))
+        for node in iter_plan_nodes(plan["Plan"]):
+            node_type = node["Node Type"]
+            if index_name := node.get("Index Name"):
+                node_type += f" ({index_name})"
+            summary.node_types[node_type] += 1
+            if sort_method := node.get("Sort Method"):
+                summary.sort_methods.add(sort_method)
+            # per loop value
+            summary.rows_removed_by_filter += node.get(
+                "Rows Removed by Filter", 0
+            ) * node.get("Actual Loops", 1)
+        summary.shared_read_blocks = plan["Plan"].get("Shared Read Blocks", 0)
+        return summary
+
+    def __str__(self):
+        lines = [
+            f"{node_type} x{count}" if count > 1 else node_type
+            for node_type, count in self.node_types.items()
+        ]
+        if self.sort_methods:
+            lines.append(f"sort: {', '.join(sorted(self.sort_methods))}")
+        if self.rows_removed_by_filter:
+            lines.append(f"rows removed by filter: {self.rows_removed_by_filter}")
+        if self.shared_read_blocks:
+            lines.append(f"blocks read: {self.shared_read_blocks}")
+        return "\n".join(lines)
+
+
+def get_main_query(queries: Iterable[CapturedQuery]) -> CapturedQuery | None:
+    """
+    Return the slowest SELECT query, considered as the main query of a request.
+    """
+    selects = [
+        query
+        for query in queries
+        if parse_query(query.sql)[1] == SQLOperationTypes.SELECT
+    ]
+    return max(selects, key=lambda query: query.duration, default=None)
@@ -0,0 +1,92 @@
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from django.conf import settings
+
+
+REGEX_IMPORT_TIME = re.compile(
+    r"^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \|(?P<indent>\s+)(?P<module>\S+)$"
+)
+
+
+@dataclass
+class ImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+    @property
+    def package(self) -> str:
+        return self.module.split(".")[0]
+
+
+def parse_import_time(output: str) -> list[ImportTime]:
+    """Parse the stderr of `python -X importtime`, other lines are ignored."""
+    imports = []
+    for line in output.splitlines():
+        match = REGEX_IMPORT_TIME.match(line)
+        if match:
+            imports.append(
+                ImportTime(
+                    module=match.group("module"),
+                    self_us=int(match.group("self")),
+                    cumulative_us=int(match.group("cumulative")),
+                    # one space after the pipe, then two per level
+                    depth=(len(match.group("indent")) - 1) // 2,
+                )
+            )
+    return imports
+
+
+def get_package_times(imports: list[ImportTime]) -> Counter:
+    """
+    Cumulative import time by top-level package, in microseconds. Each module is
+    counted once, when first imported, and its dependencies are counted for the
+    package which imported them.
+    """
+    times: Counter = Counter()
+    for import_time in imports:
+        if import_time.depth == 0:
+            times[import_time.package] += import_time.cumulative_us
+    return times
+
+
+def _manage_command(argv: list[str], lean: bool, importtime: bool):
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+    env.pop("LEAN_SETTINGS", None)
+    if lean:
+        env["LEAN_SETTINGS"] = "1"
+    command = [sys.executable, *(["-X", "importtime"] if importtime else [])]
+    return subprocess.run(
+        [*command, str(settings.BASE_DIR / "manage.py"), *argv],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def measure_startup(argv: list[str], lean: bool = False) -> tuple[float, float]:
+    """
+    Return the wall time and CPU time (user + system) of `manage.py <argv>`
+    in a new process, in seconds. CPU time is less sensitive to the machine load.
+    """
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start_time = time.perf_counter()
+    _manage_command(argv, lean, importtime=False)
+    wall_time = time.perf_counter() - start_time
+    new_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_time = new_usage.ru_utime - usage.ru_utime + new_usage.ru_stime - usage.ru_stime
+    return wall_time, cpu_time
+
+
+def profile_imports(argv: list[str], lean: bool = False) -> list[ImportTime]:
+    """Return the imports of `manage.py <argv>`, run with `-X importtime`."""
+    return parse_import_time(_manage_command(argv, lean, importtime=True).stderr)
@@ -0,0 +1,302 @@
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models.constants import LOOKUP_SEP
+from django_filters import FilterSet
+
+from utils.assert_queries import SQLOperationTypes, parse_query
+from utils.explain import explain, get_index_names
+from utils.query_capture import CapturedQuery
+
+
+# lookups compared on UPPER(column) by the PostgreSQL backend
+UPPER_LOOKUPS = {"iexact", "istartswith"}
+# lookups a btree index can't serve
+UNINDEXABLE_LOOKUPS = {"contains", "icontains", "endswith", "iendswith", "regex"}
+
+
+@dataclass
+class IndexUsage:
+    table_name: str
+    index_name: str
+    columns: list[str | None]  # None for expressions
+    operator_classes: list[int]
+    is_unique: bool
+    is_primary: bool
+    backs_constraint: bool
+    leads_with_foreign_key: bool
+    is_partial: bool
+    is_valid: bool
+    definition: str
+    size: int
+    scans: int
+    tuples_read: int
+    table_writes: int
+
+    @property
+    def is_expression(self) -> bool:
+        return None in self.columns
+
+    @property
+    def can_drop(self) -> bool:
+        return not (self.is_unique or self.is_primary or self.backs_constraint)
+
+
+@dataclass
+class Recommendation:
+    action: str  # "drop" or "create"
+    table_name: str
+    index_name: str
+    reason: str
+    sql: str
+    size: int = 0
+    # index entries written since the stats reset, saved by a drop, added by a create
+    writes: int = 0
+    # for redundant indexes, the index that makes the drop safe
+    covering_index_name: str | None = None
+
+
+def get_index_usage(table_prefix: str = "books_") -> list[IndexUsage]:
+    sql_file = settings.BASE_DIR / "sql_utils" / "index_usage.sql"
+    sql_query = sql_file.read_text()
+    with connection.cursor() as cursor:
+        cursor.execute(sql_query, [table_prefix.replace("_", r"\_") + "%"])
+        col_names = [desc[0] for desc in cursor.description]
+        return [IndexUsage(**dict(zip(col_names, row))) for row in cursor.fetchall()]
+
+
+def get_stats_reset() -> datetime | None:
+    """Return when the usage counters were reset, None if they never were."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()"
+        )
+        (stats_reset,) = cursor.fetchone()
+    return stats_reset
+
+
+def get_workload_index_names(queries: Iterable[CapturedQuery]) -> set[str]:
+    """
+    Return the indexes used by the plans of the captured SELECT queries,
+    explained once per fingerprint.
+    """
+    index_names: set[str] = set()
+    explained = set()
+    for query in queries:
+        if query.many or query.fingerprint in explained:
+            continue
+        explained.add(query.fingerprint)
+        try:
+            operation = parse_query(query.sql)[1]
+        except NotImplementedError:
+            continue
+        if operation == SQLOperationTypes.SELECT:
+            index_names |= get_index_names(explain(query.sql, query.params))
+    return index_names
+
+
+def get_statements_index_names(table_prefix: str = "books_", limit: int = 50):
+    """
+    Return the indexes used by the most expensive statements of pg_stat_statements,
+    or None if the extension is not installed.
+    Statements are explained with generic plans, which requires PostgreSQL 16+.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS(SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements')"
+        )
+        (installed,) = cursor.fetchone()
+        if not installed:
+            return None
+        cursor.execute(
+            "SELECT query FROM pg_stat_statements "
+            "WHERE query ILIKE 'SELECT%%' AND query LIKE %s "
+            "ORDER BY total_exec_time DESC LIMIT %s",
+            ["%" + table_prefix.replace("_", r"\_") + "%", limit],
+        )
+        statements = [query for (query,) in cursor.fetchall()]
+
+    index_names: set[str] = set()
+    for statement in statements:
+        try:
+            with transaction.atomic():
+                index_names |= get_index_names(explain(statement, generic_plan=True))
+        except DatabaseError:
+            continue
+    return index_names
+
+
+def find_redundant_indexes(indexes: list[IndexUsage]) -> list[Recommendation]:
+    """
+    Indexes whose columns are a prefix of another index on the same table,
+    e.g. the index of a foreign key covered by a composite index starting with it.
+    """
+    recommendations = []
+    for index in indexes:
+        if not index.can_drop or index.is_partial or index.is_expression:
+            continue
+        for other in indexes:
+            if (
+                other is index
+                or other.table_name != index.table_name
+                or other.is_partial
+                or not other.is_valid
+                or other.columns[: len(index.columns)] != index.columns
+                or other.operator_classes[: len(index.columns)]
+                != index.operator_classes
+            ):
+                continue
+            # for duplicates, keep the one that can't be dropped, or the first one
+            if len(other.columns) == len(index.columns) and (
+                other.can_drop and other.index_name > index.index_name
+            ):
+                continue
+            recommendations.append(
+                Recommendation(
+                    action="drop",
+                    table_name=index.table_name,
+                    index_name=index.index_name,
+                    reason=f"prefix of {other.index_name} ({', '.join(map(str, other.columns))})",
+                    sql=f'DROP INDEX CONCURRENTLY "{index.index_name}";',
+                    size=index.size,
+                    writes=index.table_writes,
+                    covering_index_name=other.index_name,
+                )
+            )
+            break
+    return recommendations
+
+
+def find_unused_indexes(
+    indexes: list[IndexUsage], used_index_names: set[str] = frozenset()
+) -> list[Recommendation]:
+    """
+    Indexes never scanned since the stats reset, nor by the replayed workload.
+    Indexes backing a constraint are kept.
+    """
+    return [
+        Recommendation(
+            action="drop",
+            table_name=index.table_name,
+            index_name=index.index_name,
+            reason="never scanned"
+            + (
+                ", cascade deletes of the referenced rows will scan the table"
+                if index.leads_with_foreign_key
+                else ""
+            ),
+            sql=f'DROP INDEX CONCURRENTLY "{index.index_name}";',
+            size=index.size,
+            writes=index.table_writes,
+        )
+        for index in indexes
+        if index.can_drop
+        and not index.scans
+        and index.index_name not in used_index_names
+    ]
+
+
+def find_droppable_indexes(
+    indexes: list[IndexUsage], used_index_names: set[str] = frozenset()
+) -> list[Recommendation]:
+    """
+    Redundant and unused indexes, without the indexes covering the redundant ones:
+    dropping both would leave their columns without an index.
+    """
+    redundant = find_redundant_indexes(indexes)
+    covering_names = {
+        recommendation.covering_index_name for recommendation in redundant
+    }
+    # for chains of prefixes, the covering index in the middle is kept
+    redundant = [
+        recommendation
+        for recommendation in redundant
+        if recommendation.index_name not in covering_names
+    ]
+    kept_names = (
+        {recommendation.index_name for recommendation in redundant}
+        | covering_names
+        | used_index_names
+    )
+    unused = [
+        recommendation
+        for recommendation in find_unused_indexes(indexes)
+        if recommendation.index_name not in kept_names
+    ]
+    return redundant + unused
+
+
+def _resolve_filter(model, field_name: str):
+    *relations, field_name = field_name.split(LOOKUP_SEP)
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model, model._meta.get_field(field_name)
+
+
+def _is_covered(
+    indexes: list[IndexUsage], table_name: str, columns: list[str], upper=False
+) -> bool:
+    """
+    Whether an index starts with the columns, or is on UPPER(column) with `upper`.
+    """
+    expression = re.compile(
+        rf"\(upper\(\(?{re.escape(columns[0])}\)?(::text)?\)\)", re.IGNORECASE
+    )
+    for index in indexes:
+        if index.table_name != table_name or not index.is_valid or index.is_partial:
+            continue
+        if upper:
+            if index.is_expression and expression.search(index.definition):
+                return True
+        elif index.columns[: len(columns)] == columns:
+            return True
+    return False
+
+
+def find_missing_indexes(
+    indexes: list[IndexUsage],
+    filtersets: Iterable[type[FilterSet]],
+    scope_field: str = "library",
+) -> list[Recommendation]:
+    """
+    Filters of the filtersets that no index can serve. Filters on the model of the
+    filterset are scoped by `scope_field`, so the index should start with it.
+    """
+    writes_by_table = {index.table_name: index.table_writes for index in indexes}
+    recommendations = {}
+    for filterset in filtersets:
+        filter_model = filterset._meta.model
+        for filter_ in filterset.base_filters.values():
+            if filter_.lookup_expr in UNINDEXABLE_LOOKUPS:
+                continue
+            model, field = _resolve_filter(filter_model, filter_.field_name)
+            table_name = model._meta.db_table
+            upper = filter_.lookup_expr in UPPER_LOOKUPS
+            if model is filter_model and field.name != scope_field and not upper:
+                columns = [model._meta.get_field(scope_field).column, field.column]
+            else:
+                columns = [field.column]
+            key = (table_name, upper, *columns)
+            if key in recommendations or _is_covered(
+                indexes, table_name, columns, upper
+            ):
+                continue
+
+            name_parts = [re.sub(r"_id$", "", column) for column in columns]
+            if upper:
+                name_parts.insert(0, "upper")
+            index_name = f"{model._meta.model_name}_{'_'.join(name_parts)}_idx"
+            index_columns = f"(upper({columns[0]}))" if upper else ", ".join(columns)
+            recommendations[key] = Recommendation(
+                action="create",
+                table_name=table_name,
+                index_name=index_name,
+                reason=f"{filterset.__name__}: {filter_.field_name}__{filter_.lookup_expr}",
+                sql=f'CREATE INDEX CONCURRENTLY "{index_name}" ON "{table_name}" ({index_columns});',
+                writes=writes_by_table.get(table_name, 0),
+            )
+    return list(recommendations.values())
@@ -0,0 +1,77 @@
+import json
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.db import connection, transaction
+
+from utils.sql import toggle_index
+
+
+@dataclass
+class IndexConfiguration:
+    """
+    Index changes to benchmark: existing indexes to disable, CREATE INDEX
+    statements to run, and hypothetical indexes (HypoPG), which are only
+    considered by EXPLAIN without ANALYZE.
+    """
+
+    name: str
+    disable: list[str] = field(default_factory=list)
+    create: list[str] = field(default_factory=list)
+    hypothetical: list[str] = field(default_factory=list)
+
+
+def load_index_configurations(path: str | Path) -> list[IndexConfiguration]:
+    """
+    Read the configurations from a JSON file, e.g.
+    [{"name": "no release date index", "disable": ["book_library_release_date_idx"]}]
+    """
+    with open(path) as json_file:
+        return [
+            IndexConfiguration(**configuration)
+            for configuration in json.load(json_file)
+        ]
+
+
+def _enable_hypopg():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS(SELECT 1 FROM pg_available_extensions WHERE name = 'hypopg')"
+        )
+        (available,) = cursor.fetchone()
+        if not available:
+            raise RuntimeError("hypothetical indexes require the hypopg extension")
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS hypopg")
+
+
+@contextmanager
+def index_configuration(configuration: IndexConfiguration):
+    """
+    Apply the configuration within a transaction which is always rolled back,
+    so the indexes are restored even if the block raises or the process dies.
+
+    The queries of the block must run on the same connection, and the tables
+    are locked meanwhile: CREATE INDEX blocks writes.
+    """
+    if configuration.hypothetical:
+        # outside of the transaction, so that hypopg_reset remains available
+        _enable_hypopg()
+    try:
+        with transaction.atomic():
+            try:
+                for index_name in configuration.disable:
+                    toggle_index(index_name, False)
+                with connection.cursor() as cursor:
+                    for statement in configuration.create:
+                        cursor.execute(statement)
+                    for statement in configuration.hypothetical:
+                        cursor.execute("SELECT hypopg_create_index(%s)", [statement])
+                yield
+            finally:
+                transaction.set_rollback(True)
+    finally:
+        if configuration.hypothetical:
+            # hypothetical indexes live in the session, not in the transaction
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT hypopg_reset()")
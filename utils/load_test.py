@@ -0,0 +1,142 @@
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+from utils.benchmark_results import percentile
+
+
+@dataclass
+class EndpointLoadResult:
+    path: str
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + self.errors
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    def percentile(self, percent: int) -> float:
+        return percentile(self.latencies, percent) if self.latencies else 0.0
+
+
+def _worker(
+    base_url: str, paths: list[str], offset: int, record_from: float, deadline: float
+) -> dict[str, EndpointLoadResult]:
+    """
+    Request the paths in a loop until the deadline, with a keep-alive connection.
+    Each worker starts at a different path so that endpoints are evenly loaded.
+    Requests started before `record_from` are not recorded.
+    """
+    url = urlsplit(base_url)
+    results = {path: EndpointLoadResult(path) for path in paths}
+    connection = http.client.HTTPConnection(url.hostname, url.port, timeout=60)
+    index = offset
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        start_time = time.perf_counter()
+        warming_up = start_time < record_from
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            results[path].errors += not warming_up
+            connection.close()
+            connection = http.client.HTTPConnection(url.hostname, url.port, timeout=60)
+            continue
+        if warming_up:
+            continue
+        if response.status >= 400:
+            results[path].errors += 1
+        else:
+            results[path].latencies.append(time.perf_counter() - start_time)
+    connection.close()
+    return results
+
+
+def run_load_test(
+    base_url: str,
+    paths: list[str],
+    concurrency: int,
+    duration: float,
+    warmup: float = 1,
+) -> dict[str, EndpointLoadResult]:
+    """
+    Send requests to the paths from `concurrency` threads during `duration` seconds,
+    after `warmup` seconds during which results are not recorded.
+    """
+    assert concurrency > 0 and paths
+    record_from = time.perf_counter() + warmup
+    deadline = record_from + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(_worker, base_url, paths, offset, record_from, deadline)
+            for offset in range(concurrency)
+        ]
+        worker_results = [future.result() for future in futures]
+
+    results = {path: EndpointLoadResult(path) for path in paths}
+    for worker_result in worker_results:
+        for path, result in worker_result.items():
+            results[path].latencies += result.latencies
+            results[path].errors += result.errors
+    return results
+
+
+def _get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def gunicorn_server(workers: int, timeout: float = 30) -> Iterator[str]:
+    """
+    Start a local gunicorn server for the playground, and yield its base url.
+    """
+    port = _get_free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "playground.wsgi",
+            "--bind",
+            f"127.0.0.1:{port}",
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE},
+    )
+    try:
+        deadline = time.perf_counter() + timeout
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.perf_counter() > deadline:
+                    raise RuntimeError("gunicorn server did not start")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait()
@@ -1,34 +1,147 @@
-from threading import Thread
-from time import sleep
+import os
+import resource
+import tracemalloc
+from collections import Counter
+from contextlib import ContextDecorator
+from dataclasses import dataclass, field
 
 import psutil
+from django.db.models.signals import post_init
+from rich import print
+
+
+PROC_STATUS = "/proc/self/status"
+PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+def format_size(size: int) -> str:
+    return f"[cyan]{size / 2**20:.2f}[/cyan] MB"
+
+
+def _reset_rss_high_water_mark() -> bool:
+    """
+    Reset the peak RSS of the process (Linux only).
+    Return False if it is not supported, the peak is then the peak since startup.
+    """
+    try:
+        with open(PROC_CLEAR_REFS, "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def _get_rss_high_water_mark() -> int:
+    try:
+        with open(PROC_STATUS) as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # kilobytes on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if os.uname().sysname == "Darwin" else max_rss * 1024
+
+
+@dataclass
+class MemoryReport:
+    # python allocations, relative to the start of the block
+    peak: int = 0
+    net: int = 0
+    # resident set size of the whole process
+    rss_start: int = 0
+    rss_high_water_mark: int = 0
+    rss_high_water_mark_is_global: bool = False
+    top_allocations: list[tracemalloc.StatisticDiff] = field(default_factory=list)
+    instances_created: Counter = field(default_factory=Counter)
+
+    def __str__(self):
+        hwm_scope = "since startup" if self.rss_high_water_mark_is_global else "peak"
+        lines = [
+            f"Python allocations: peak {format_size(self.peak)}, "
+            f"net {format_size(self.net)}",
+            f"Process RSS: start {format_size(self.rss_start)}, "
+            f"{hwm_scope} {format_size(self.rss_high_water_mark)}",
+        ]
+        if self.instances_created:
+            lines.append("Model instances created:")
+            lines += [
+                f"  {label}: {count}"
+                for label, count in self.instances_created.most_common()
+            ]
+        if self.top_allocations:
+            lines.append("Top allocation sites, still allocated at the end:")
+            lines += [f"  {stat}" for stat in self.top_allocations]
+        return "\n".join(lines)
+
+
+class memory_profile(ContextDecorator):
+    """
+    Context manager and decorator measuring the memory used by a block of code:
+    peak and net Python allocations (tracemalloc), with the top allocation sites,
+    the peak RSS of the process, and the count of Django model instances created.
+
+    Usage:
+
+        with memory_profile() as profile:
+            for person in Person.objects.iterator():
+                pass
+        profile.report.peak
+
+        @memory_profile(top=5)
+        def iter_over_persons():
+            ...
+
+    tracemalloc slows down allocations, durations are not meaningful meanwhile.
+    """
+
+    def __init__(self, top: int = 10, print_report: bool = True, frames: int = 1):
+        self.top = top
+        self.print_report = print_report
+        self.frames = frames
+        self.report = MemoryReport()
+
+    def _count_instance(self, sender, **kwargs):
+        self.report.instances_created[sender._meta.label] += 1
+
+    def __enter__(self):
+        self.report = MemoryReport()
+        self._was_tracing = tracemalloc.is_tracing()
+        if not self._was_tracing:
+            tracemalloc.start(self.frames)
+        tracemalloc.reset_peak()
+        self._start_snapshot = tracemalloc.take_snapshot() if self.top else None
+        self._start_memory, _ = tracemalloc.get_traced_memory()
+
+        self.report.rss_high_water_mark_is_global = not _reset_rss_high_water_mark()
+        self.report.rss_start = psutil.Process().memory_info().rss
+        post_init.connect(self._count_instance, weak=False)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        post_init.disconnect(self._count_instance)
+        current_memory, peak_memory = tracemalloc.get_traced_memory()
+        self.report.peak = peak_memory - self._start_memory
+        self.report.net = current_memory - self._start_memory
+        self.report.rss_high_water_mark = _get_rss_high_water_mark()
+
+        if self._start_snapshot is not None:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)]
+            )
+            self.report.top_allocations = snapshot.compare_to(
+                self._start_snapshot, "lineno"
+            )[: self.top]
+        if not self._was_tracing:
+            tracemalloc.stop()
+
+        if self.print_report:
+            print(str(self.report))
 
 
 def measure_ram_consumption(function_to_audit):
     """Output the RAM consumption of the function passed as parameter"""
-    initial_available_memory = psutil.virtual_memory().available
-    min_available_memory = initial_available_memory
-    is_running = True
-    mem_data = []
-
-    class RamUsageThread(Thread):
-        def run(self) -> None:
-            nonlocal min_available_memory
-            while is_running:
-                available_memory = psutil.virtual_memory().available
-                mem_data.append(available_memory)
-                min_available_memory = min(available_memory, min_available_memory)
-                sleep(0.1)
-            return min_available_memory
-
-    ram_thread = RamUsageThread()
-    ram_thread.start()
-    function_to_audit()
-    is_running = False
-
-    print(
-        "RAM consumption:",
-        (initial_available_memory - min_available_memory) / 2**20,
-        "MB",
-    )
-    return mem_data
+    with memory_profile() as profile:
+        function_to_audit()
+    return profile.report
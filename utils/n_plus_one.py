@@ -0,0 +1,107 @@
+import traceback
+from collections.abc import Iterable
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, Sequence
+
+from django.db import DEFAULT_DB_ALIAS
+
+from utils.assert_queries import SQLOperationTypes, parse_query
+from utils.query_capture import CapturedQuery, QueryRecorder, capture_queries
+
+
+@dataclass(slots=True)
+class RepeatedQuery:
+    fingerprint: str
+    target: str  # model name, as returned by parse_query
+    count: int
+    example_sql: str
+    stacks: list[list[traceback.FrameSummary]] = field(default_factory=list)
+
+    def __str__(self):
+        message = (
+            f"{self.target or '<unknown>'}:SELECT executed {self.count} times\n"
+            f"\t{self.example_sql[:500]}\n"
+        )
+        for stack in self.stacks:
+            message += "  Called from:\n" + "".join(traceback.format_list(stack))
+        return message
+
+
+class NPlusOneException(Exception):
+    def __init__(self, repeated_queries: Sequence[RepeatedQuery]):
+        """
+        Exception raised when the same SELECT query shape is executed too many times.
+        """
+        super().__init__("Potential N+1 queries detected")
+        self.repeated_queries = repeated_queries
+
+    def __str__(self):
+        return f"{self.args[0]}:\n\n" + "\n".join(map(str, self.repeated_queries))
+
+
+def find_repeated_queries(
+    queries: Iterable[CapturedQuery], threshold: int = 3
+) -> list[RepeatedQuery]:
+    """
+    Group captured SELECT queries by fingerprint and return the groups executed
+    at least `threshold` times, most repeated first.
+
+    Distinct call-sites are reported once each.
+    """
+    repeated: dict[str, RepeatedQuery] = {}
+    call_sites: dict[str, set[tuple]] = {}
+    for query in queries:
+        try:
+            target, operation = parse_query(query.sql)
+        except NotImplementedError:
+            continue
+        if operation != SQLOperationTypes.SELECT:
+            continue
+
+        group = repeated.setdefault(
+            query.fingerprint,
+            RepeatedQuery(query.fingerprint, target, count=0, example_sql=query.sql),
+        )
+        group.count += 1
+
+        if query.stack:
+            call_site = tuple((frame.filename, frame.lineno) for frame in query.stack)
+            seen = call_sites.setdefault(query.fingerprint, set())
+            if call_site not in seen:
+                seen.add(call_site)
+                group.stacks.append(query.stack)
+
+    return sorted(
+        (group for group in repeated.values() if group.count >= threshold),
+        key=lambda group: group.count,
+        reverse=True,
+    )
+
+
+@contextmanager
+def assert_no_n_plus_one(
+    threshold: int = 3,
+    allowed: Iterable[str] = (),
+    using: str = DEFAULT_DB_ALIAS,
+) -> Iterator[QueryRecorder]:
+    """
+    Context manager raising NPlusOneException if a SELECT with the same shape is
+    executed at least `threshold` times within the block.
+
+    `allowed` is a list of targets (ex: "books.Person") for which repetitions
+    are expected.
+    """
+    allowed = set(allowed)
+    with capture_queries(
+        QueryRecorder(max_queries=None, capture_stack=True), using=using
+    ) as recorder:
+        yield recorder
+
+    repeated_queries = [
+        repeated_query
+        for repeated_query in find_repeated_queries(recorder.queries, threshold)
+        if repeated_query.target not in allowed
+    ]
+    if repeated_queries:
+        raise NPlusOneException(repeated_queries)
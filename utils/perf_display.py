@@ -1,9 +1,10 @@
 import time
-from contextlib import contextmanager
+from contextlib import ExitStack, contextmanager
 
-from django.db import connection, reset_queries
 from rich import print
 
+from utils.query_capture import QueryRecorder, capture_queries
+
 
 def format_duration(duration):
     return f"[cyan]{duration:.2f}[/cyan]"
@@ -11,22 +12,34 @@ def format_duration(duration):
 
 @contextmanager
 def perf_counter(message="Duration", time_sql=False, print_sql=False):
-    if time_sql:
-        reset_queries()
+    """
+    Print the duration of the block.
+    With `time_sql`, SQL queries are timed with an execute wrapper,
+    so it doesn't require DEBUG to be True.
+    With `print_sql`, only the last 1000 queries are printed (see QueryRecorder),
+    preceded by the number of the earlier ones.
+    """
+    with ExitStack() as stack:
+        recorder = (
+            stack.enter_context(capture_queries(using=None)) if time_sql else None
+        )
+        start_time = time.perf_counter()
+        yield recorder
+        total_duration = time.perf_counter() - start_time
 
-    start_time = time.perf_counter()
-    yield
     msg = message
-    msg += f"\n  Total: {format_duration(time.perf_counter() - start_time)}"
-    if time_sql:
-        msg += f"\n  SQL: {total_sql_duration(connection.queries)}"
+    msg += f"\n  Total: {format_duration(total_duration)}"
+    if recorder is not None:
+        msg += f"\n  SQL: {total_sql_duration(recorder)}"
         if print_sql:
-            for query in connection.queries:
+            if skipped := recorder.total_count - len(recorder.queries):
+                msg += f"\n\n{' '*6}({skipped} earlier queries not kept)"
+            for query in recorder.queries:
                 msg += (
-                    f" \n\n{' '*6}(duration: {query['time']})   {query['sql'][:1000]}"
+                    f" \n\n{' '*6}(duration: {query.duration:.3f})   {query.sql[:1000]}"
                 )
     print(msg)
 
 
-def total_sql_duration(queries):
-    return format_duration(sum(float(query["time"]) for query in queries))
+def total_sql_duration(recorder: QueryRecorder):
+    return format_duration(recorder.total_duration)
@@ -0,0 +1,111 @@
+import cProfile
+import hmac
+import pstats
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from utils.query_capture import capture_queries
+
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_QUERY_PARAM = "profile"
+
+# a function's own time goes to the first category matching "filename:function"
+TIME_CATEGORIES = [
+    ("sql", ("psycopg", "django/db/backends", "django/db/utils")),
+    ("orm", ("django/db/models",)),
+    (
+        "serialization",
+        ("rest_framework/serializers", "rest_framework/fields", "serializ"),
+    ),
+    ("rendering", ("rest_framework/renderers", "django/template", "json")),
+]
+
+
+def get_time_breakdown(stats: pstats.Stats) -> Counter:
+    """
+    Split the time of a profile into SQL / ORM / serialization / rendering / other,
+    by attributing the own time of each function to a category.
+    """
+    breakdown: Counter = Counter()
+    for (filename, _, function_name), stat in stats.stats.items():  # type: ignore
+        own_time = stat[2]
+        location = f"{filename}:{function_name}".lower()
+        category = next(
+            (
+                name
+                for name, patterns in TIME_CATEGORIES
+                if any(pattern in location for pattern in patterns)
+            ),
+            "other",
+        )
+        breakdown[category] += own_time
+    return breakdown
+
+
+def save_profile(stats: pstats.Stats, path: str) -> Path:
+    profiles_dir = Path(
+        getattr(settings, "PROFILING_DIR", settings.BASE_DIR / "profiles")
+    )
+    profiles_dir.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"\W+", "_", path).strip("_")
+    profile_path = profiles_dir / f"{datetime.now():%Y%m%d_%H%M%S_%f}_{slug}.pstats"
+    stats.dump_stats(profile_path)
+    return profile_path
+
+
+class ProfilingMiddleware:
+    """
+    Profile the requests with cProfile, when the X-Profile header or the `profile`
+    query param matches settings.PROFILING_TOKEN. Disabled without a token.
+
+    The time split (SQL, ORM, serialization, rendering) is returned in the
+    Server-Timing header, and the profile is stored in settings.PROFILING_DIR,
+    to inspect with `python -m pstats` or snakeviz.
+    """
+
+    def __init__(self, get_response: Callable):
+        self.get_response = get_response
+        self.token = getattr(settings, "PROFILING_TOKEN", None)
+        if not self.token:
+            raise MiddlewareNotUsed()
+
+    def is_authorized(self, request) -> bool:
+        token = request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_QUERY_PARAM)
+        return bool(token) and hmac.compare_digest(token, self.token)
+
+    def __call__(self, request):
+        if not self.is_authorized(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        with capture_queries() as recorder:
+            start_time = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            total_duration = time.perf_counter() - start_time
+
+        stats = pstats.Stats(profiler)
+        breakdown = get_time_breakdown(stats)
+        profile_path = save_profile(stats, request.path)
+
+        timings = [
+            f'sql;dur={breakdown["sql"] * 1000:.1f};desc="{recorder.total_count} queries"'
+        ] + [
+            f"{category};dur={breakdown[category] * 1000:.1f}"
+            for category in ("orm", "serialization", "rendering", "other")
+        ]
+        timings.append(f"total;dur={total_duration * 1000:.1f}")
+        response["Server-Timing"] = ", ".join(timings)
+        response["X-Profile-File"] = profile_path.name
+        return response
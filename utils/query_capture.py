@@ -0,0 +1,195 @@
+import re
+import time
+import traceback
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Iterator
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REGEX_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+REGEX_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+REGEX_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+REGEX_VALUES_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+REGEX_SAVEPOINT_NAME = re.compile(r'(SAVEPOINT\s+)"[^"]*"', re.IGNORECASE)
+REGEX_WHITESPACE = re.compile(r"\s+")
+
+
+def get_project_stack() -> list[traceback.FrameSummary]:
+    """
+    Return the current call stack, restricted to the frames of this project
+    (no django, no third party libraries, no frame from this module).
+    """
+    base_dir = str(settings.BASE_DIR)
+    return [
+        frame
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir)
+        and "site-packages" not in frame.filename
+        and frame.filename != __file__
+    ]
+
+
+def fingerprint_sql(sql: str) -> str:
+    """
+    Normalize a SQL query so that queries with the same shape share the same
+    fingerprint: literals and placeholders are replaced by `?`, lists of values
+    (`IN (%s, %s, ...)`, multi-rows INSERT) are collapsed, savepoint names are
+    dropped and whitespaces are squashed.
+    """
+    sql = REGEX_STRING_LITERAL.sub("?", sql)
+    sql = REGEX_PLACEHOLDER.sub("?", sql)
+    sql = REGEX_NUMBER_LITERAL.sub("?", sql)
+    sql = REGEX_VALUES_LIST.sub("(?+)", sql)
+    sql = REGEX_SAVEPOINT_NAME.sub(r"\1?", sql)
+    return REGEX_WHITESPACE.sub(" ", sql).strip()
+
+
+@dataclass(slots=True)
+class CapturedQuery:
+    sql: str
+    params: Any
+    fingerprint: str
+    duration: float
+    many: bool = False
+    stack: list[traceback.FrameSummary] | None = None
+    using: str = DEFAULT_DB_ALIAS
+
+
+@dataclass(slots=True)
+class FingerprintStats:
+    fingerprint: str
+    count: int = 0
+    total_duration: float = 0.0
+    max_duration: float = 0.0
+
+    @property
+    def mean_duration(self) -> float:
+        return self.total_duration / self.count if self.count else 0.0
+
+
+class QueryRecorder:
+    """
+    Execute wrapper (see `connection.execute_wrapper`) recording the duration of
+    every query, without relying on `DEBUG = True`.
+
+    Memory stays bounded: only the last `max_queries` queries are kept, and
+    statistics are aggregated for at most `max_fingerprints` distinct fingerprints.
+    Queries with a new shape past that limit are accounted under `OVERFLOW_KEY`.
+    Use `max_queries=None` to keep every query.
+
+    With `capture_stack`, the project call stack of each query is kept, which is
+    useful to find where a query comes from, but slow.
+    """
+
+    OVERFLOW_KEY = "<other>"
+
+    def __init__(
+        self,
+        max_queries: int | None = 1_000,
+        max_fingerprints: int = 500,
+        capture_stack: bool = False,
+    ):
+        assert max_queries is None or max_queries > 0
+        assert max_fingerprints > 0
+        self.queries: deque[CapturedQuery] = deque(maxlen=max_queries)
+        self.stats: dict[str, FingerprintStats] = {}
+        self.max_fingerprints = max_fingerprints
+        self.capture_stack = capture_stack
+        self._lock = Lock()
+
+    def __call__(
+        self, execute: Callable, sql: str, params: Any, many: bool, context: dict
+    ) -> Any:
+        start_time = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start_time
+            self.record(sql, params, duration, many, context["connection"].alias)
+
+    def record(
+        self,
+        sql: str,
+        params: Any,
+        duration: float,
+        many: bool = False,
+        using: str = DEFAULT_DB_ALIAS,
+    ):
+        query = CapturedQuery(
+            sql=sql,
+            params=params,
+            fingerprint=fingerprint_sql(sql),
+            duration=duration,
+            many=many,
+            stack=get_project_stack() if self.capture_stack else None,
+            using=using,
+        )
+        with self._lock:
+            self.queries.append(query)
+            key = query.fingerprint
+            if key not in self.stats and len(self.stats) >= self.max_fingerprints:
+                key = self.OVERFLOW_KEY
+            stats = self.stats.setdefault(key, FingerprintStats(key))
+            stats.count += 1
+            stats.total_duration += duration
+            stats.max_duration = max(stats.max_duration, duration)
+        return query
+
+    def reset(self) -> None:
+        with self._lock:
+            self.queries.clear()
+            self.stats.clear()
+
+    @property
+    def total_duration(self) -> float:
+        return sum(stats.total_duration for stats in self.stats.values())
+
+    @property
+    def total_count(self) -> int:
+        return sum(stats.count for stats in self.stats.values())
+
+    def top(self, n: int = 10, key: str = "total_duration") -> list[FingerprintStats]:
+        """Return the `n` most expensive fingerprints, sorted by `key`."""
+        with self._lock:
+            stats = list(self.stats.values())
+        return sorted(stats, key=lambda s: getattr(s, key), reverse=True)[:n]
+
+
+@contextmanager
+def capture_queries(
+    recorder: QueryRecorder | None = None, using: str | None = DEFAULT_DB_ALIAS
+) -> Iterator[QueryRecorder]:
+    """
+    Record the queries executed on the `using` connection within the block,
+    or on every connection (replicas included) with `using=None`.
+    """
+    recorder = recorder or QueryRecorder()
+    aliases = list(connections) if using is None else [using]
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+# process wide recorder, fed by QueryCaptureMiddleware
+global_recorder = QueryRecorder()
+
+
+class QueryCaptureMiddleware:
+    """
+    Record the queries of every request into `global_recorder`, on every database
+    so that the reads sent to the replicas are recorded too.
+    Cheap enough to be enabled in production, with DEBUG off.
+    """
+
+    def __init__(self, get_response: Callable):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with capture_queries(global_recorder, using=None):
+            return self.get_response(request)
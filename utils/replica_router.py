@@ -0,0 +1,103 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+STICKY_COOKIE = "primary_until"
+
+
+@dataclass
+class _ReplicaState:
+    enabled: bool
+    wrote: bool = False
+
+
+# replicas are only read from within read_from_replicas(), e.g. during the safe
+# requests of ReplicaMiddleware, and until something is written
+_replica_state: ContextVar[_ReplicaState | None] = ContextVar(
+    "replica_state", default=None
+)
+
+
+def get_replica_aliases() -> list[str]:
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+@contextmanager
+def read_from_replicas(enabled: bool = True):
+    state = _ReplicaState(enabled)
+    token = _replica_state.set(state)
+    try:
+        yield state
+    finally:
+        _replica_state.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Route the reads to a random replica of settings.DATABASE_REPLICAS, within
+    read_from_replicas() only. Writes go to the primary, and pin the following
+    reads of the context to it, so that they see the writes.
+    Migrations only run on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _replica_state.get()
+        replicas = get_replica_aliases()
+        if replicas and state is not None and state.enabled and not state.wrote:
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if (state := _replica_state.get()) is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas have the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *get_replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    Read from the replicas during safe requests (GET, HEAD, OPTIONS).
+
+    After a write, the client gets a cookie sending its requests to the primary
+    for settings.REPLICA_STICKY_SECONDS, which should be longer than the
+    replication lag, so that it reads its own writes.
+    """
+
+    def __init__(self, get_response: Callable):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            sticky = float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            sticky = False
+        safe = request.method in SAFE_METHODS
+        with read_from_replicas(safe and not sticky) as state:
+            response = self.get_response(request)
+        if state.wrote or not safe:
+            sticky_seconds = getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+            response.set_cookie(
+                STICKY_COOKIE,
+                str(time.time() + sticky_seconds),
+                max_age=sticky_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
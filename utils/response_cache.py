@@ -0,0 +1,130 @@
+import time
+from functools import wraps
+from hashlib import sha1
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, urlencode
+
+from utils.replica_router import get_replica_aliases, read_from_replicas
+
+
+# see CACHES in the settings, a bounded local memory LRU by default
+RESPONSE_CACHE_ALIAS = "responses"
+# shared by every process, the database by default
+RESPONSE_VERSION_CACHE_ALIAS = "response_versions"
+
+
+def _get_version_key(library_id: int) -> str:
+    return f"library-version:{library_id}"
+
+
+def get_library_version(library_id: int) -> int:
+    """
+    Return the version of the cached responses of a library.
+    An unknown version (never set, or evicted) is replaced by a new one,
+    so that responses cached with an older version can't be served.
+    """
+    cache = caches[RESPONSE_VERSION_CACHE_ALIAS]
+    key = _get_version_key(library_id)
+    # from the primary, replicas may not have the last version yet
+    with read_from_replicas(False):
+        version = cache.get(key)
+        if version is None:
+            version = time.time_ns()
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+    return version
+
+
+def invalidate_library(library_id: int) -> None:
+    """
+    Bump the version of the library, its cached responses are not used anymore.
+    Called on saves and deletes (see books/signals.py), but not by bulk operations
+    (bulk_create, QuerySet.update / delete), which should call it themselves.
+    Cached responses also include persons (authors, readers), which are not
+    library-scoped: their writes are only visible once cached responses expire.
+    """
+    # the version is the time of the last write, see cache_library_response
+    caches[RESPONSE_VERSION_CACHE_ALIAS].set(
+        _get_version_key(library_id), time.time_ns(), timeout=None
+    )
+
+
+def invalidate_library_on_commit(*library_ids: int) -> None:
+    # before the commit, a concurrent request would cache the previous rows
+    # with the new version
+    for library_id in set(library_ids):
+        transaction.on_commit(
+            lambda library_id=library_id: invalidate_library(library_id)
+        )
+
+
+def get_response_key(view_name: str, library_id: int, version: int, request) -> str:
+    """
+    Key of a response, from the query params in a normalized order, the media type
+    and the host, which is part of the absolute urls of the Link header.
+    """
+    params = sorted(
+        (key, value) for key, values in request.GET.lists() for value in values
+    )
+    digest = sha1(
+        f"{request.get_host()}|{request.accepted_media_type}|{urlencode(params)}".encode()
+    ).hexdigest()
+    return f"response:{view_name}:{library_id}:{version}:{digest}"
+
+
+def cache_library_response(get: Callable) -> Callable:
+    """
+    Cache the rendered responses of the `get(self, request, library_id)` method of
+    an API view, when settings.RESPONSE_CACHE_ENABLED is set.
+
+    The key includes the version of the library, bumped on writes: invalidation is
+    O(1), outdated responses are evicted by the LRU. Responses have an ETag, and
+    requests with a matching If-None-Match get a 304. With the default local memory
+    cache, a hit only queries the version, which is shared by the processes.
+    With replicas, nothing is cached until the replication lag has passed.
+    """
+
+    @wraps(get)
+    def cached_get(view, request, library_id: int, *args, **kwargs):
+        if not getattr(settings, "RESPONSE_CACHE_ENABLED", False):
+            return get(view, request, library_id, *args, **kwargs)
+
+        version = get_library_version(library_id)
+        replication_lag = getattr(settings, "REPLICA_STICKY_SECONDS", 0) * 1e9
+        if get_replica_aliases() and time.time_ns() - version < replication_lag:
+            # replicas may not have the last writes yet, nor a response built from them
+            return get(view, request, library_id, *args, **kwargs)
+
+        key = get_response_key(type(view).__name__, library_id, version, request)
+        etag = f'"{sha1(key.encode()).hexdigest()}"'
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        cache = caches[RESPONSE_CACHE_ALIAS]
+        cached = cache.get(key)
+        if cached is None:
+            response = get(view, request, library_id, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            # rendered here instead of by finalize_response, to store the content
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = view.get_renderer_context()
+            response.render()
+            cache.set(key, (response.content, dict(response.items())))
+            response["X-Cache"] = "miss"
+        else:
+            content, headers = cached
+            response = HttpResponse(content, headers=headers)
+            response["X-Cache"] = "hit"
+        response["ETag"] = etag
+        return response
+
+    return cached_get
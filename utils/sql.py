@@ -21,24 +21,38 @@ def indexes_size(valid_only=True):
         return (col_names, cursor.fetchall())
 
 
+def get_index_validity(*index_names) -> dict[str, bool]:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexrelid::regclass::text, indisvalid FROM pg_index "
+            "WHERE indexrelid = ANY(%s::regclass[])",
+            [list(index_names)],
+        )
+        return dict(cursor.fetchall())
+
+
 @contextmanager
-def use_indexes(*index_names):
-    for index_name in index_names:
-        toggle_index(index_name, True)
-    yield
+def toggle_indexes(active: bool, *index_names):
+    """
+    Activate or deactivate the indexes within the block,
+    and restore their previous state on exit, even if the block raises.
+    """
+    previous_validity = get_index_validity(*index_names)
+    try:
+        for index_name in index_names:
+            toggle_index(index_name, active)
+        yield
+    finally:
+        for index_name, valid in previous_validity.items():
+            toggle_index(index_name, valid)
 
-    for index_name in index_names:
-        toggle_index(index_name, False)
 
+def use_indexes(*index_names):
+    return toggle_indexes(True, *index_names)
 
-@contextmanager
-def disable_indexes(*index_names):
-    for index_name in index_names:
-        toggle_index(index_name, False)
-    yield
 
-    for index_name in index_names:
-        toggle_index(index_name, True)
+def disable_indexes(*index_names):
+    return toggle_indexes(False, *index_names)
 
 
 def toggle_all_custom_indexes(active):
@@ -46,3 +60,35 @@ def toggle_all_custom_indexes(active):
     sql_query = sql_file.read_text()
     with connection.cursor() as cursor:
         cursor.execute(sql_query, [active])
+
+
+def reconnect():
+    """
+    Open a new database connection, so that the backend starts with empty
+    catalog and plan caches. Shared buffers and the OS page cache are not
+    evicted, which requires a restart of PostgreSQL and dropping the OS caches.
+    """
+    connection.close()
+    # connect now, so that the connection setup is not part of a measure
+    connection.ensure_connection()
+
+
+def prewarm_tables(table_prefix: str) -> bool:
+    """
+    Load the tables starting with `table_prefix`, and their indexes, in the
+    shared buffers with pg_prewarm. Return False if the extension is not available.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS(SELECT 1 FROM pg_available_extensions WHERE name = 'pg_prewarm')"
+        )
+        (available,) = cursor.fetchone()
+        if not available:
+            return False
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_prewarm")
+        cursor.execute(
+            "SELECT pg_prewarm(oid) FROM pg_class "
+            "WHERE relname LIKE %s AND relkind IN ('r', 'i')",
+            [table_prefix.replace("_", r"\_") + "%"],
+        )
+    return True